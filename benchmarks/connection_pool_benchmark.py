@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+  Compares requests/sec of Media.get with and without the keep-alive connection pool, against a local HTTP/1.1 server.
+  Against the real (TLS) servers the difference is larger, since every new connection also needs a TLS handshake.
+
+  Usage: benchmarks/connection_pool_benchmark.py [number of requests]
+"""
+import http.server
+import sys
+import threading
+import time
+
+from npoapi import Media
+from npoapi.connection_pool import ConnectionPool
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    body = b'{"objectType":"program","mid":"WO_VPRO_783763","type":"BROADCAST","avType":"VIDEO"}'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(client, count):
+    start = time.perf_counter()
+    for i in range(count):
+        client.get("WO_VPRO_783763")
+    return count / (time.perf_counter() - start)
+
+
+def main(count=2000):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:%d/v1" % server.server_address[1]
+
+    client = Media(key="key", secret="secret", origin="http://www.vpro.nl", env=url)
+    without_pool = run(client.connection_pool(False), count)
+    pool = ConnectionPool()
+    with_pool = run(client.connection_pool(pool), count)
+    print("urllib.request.urlopen: %8.1f requests/sec" % without_pool)
+    print("connection pool       : %8.1f requests/sec (%s)" % (with_pool, pool))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
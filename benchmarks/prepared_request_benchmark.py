@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+  Compares the client side overhead of Media.get with that of a prepared request for the same endpoint, both for only
+  building the signed request and for executing it against an in process WSGI application.
+
+  Usage: benchmarks/prepared_request_benchmark.py [number of requests]
+"""
+import sys
+import time
+
+from npoapi import Media
+from npoapi.transport import WsgiTransport
+
+MEDIA = b'{"objectType":"program","mid":"WO_VPRO_783763","type":"BROADCAST","avType":"VIDEO"}'
+PARAMS = {"properties": "title,description", "profile": "vpro", "sort": None, "max": None}
+
+
+def app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [MEDIA]
+
+
+def measure(name, count, call):
+    start = time.perf_counter()
+    for i in range(count):
+        call()
+    elapsed = time.perf_counter() - start
+    print("%-30s %10.1f calls/sec %8.1f us/call" % (name, count / elapsed, 1000000 * elapsed / count))
+
+
+def main(count=50000):
+    media = Media(key="key", secret="secret", origin="http://www.vpro.nl").transport(WsgiTransport(app))
+    prepared = media.prepare("/api/media/{mid}", **PARAMS)
+    measure("build request", count, lambda: media._build_request("/api/media/WO_VPRO_783763", PARAMS))
+    measure("build prepared request", count, lambda: prepared.build(mid="WO_VPRO_783763"))
+    measure("Media.get", count, lambda: media.get("WO_VPRO_783763", properties="title,description", profile="vpro"))
+    measure("prepared Media.get", count, lambda: prepared(mid="WO_VPRO_783763"))
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+  Measures the client side overhead (url building, signing, headers, parsing) of some calls, by executing them against an
+  in process WSGI application instead of a server.
+
+  Usage: benchmarks/wsgi_transport_benchmark.py [number of requests]
+"""
+import sys
+import time
+
+from npoapi import Media, MediaBackend
+from npoapi.transport import WsgiTransport
+
+MEDIA = b'{"objectType":"program","mid":"WO_VPRO_783763","type":"BROADCAST","avType":"VIDEO"}'
+MEMBERS = (b'<list xmlns="urn:vpro:media:update:2009" totalCount="100" offset="0" max="20">' +
+           b''.join(b'<item position="%d"><mediaUpdate mid="WO_VPRO_%d"/></item>' % (i, i) for i in range(20)) +
+           b'</list>')
+EMPTY_MEMBERS = b'<list xmlns="urn:vpro:media:update:2009" totalCount="100" offset="100" max="20"></list>'
+
+
+def app(environ, start_response):
+    if environ["PATH_INFO"].endswith("/members"):
+        start_response("200 OK", [("Content-Type", "application/xml")])
+        return [EMPTY_MEMBERS if "offset=100" in environ["QUERY_STRING"] else MEMBERS]
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [MEDIA]
+
+
+def measure(name, count, call):
+    start = time.perf_counter()
+    for i in range(count):
+        call()
+    elapsed = time.perf_counter() - start
+    print("%-30s %10.1f calls/sec %8.1f us/call" % (name, count / elapsed, 1000000 * elapsed / count))
+
+
+def main(count=20000):
+    transport = WsgiTransport(app)
+    media = Media(key="key", secret="secret", origin="http://www.vpro.nl").transport(transport)
+    measure("Media.get", count, lambda: media.get("WO_VPRO_783763"))
+    measure("Media.get (with properties)", count, lambda: media.get("WO_VPRO_783763", properties="title,description", profile="vpro"))
+
+    backend = MediaBackend().transport(transport)
+    backend.url = "http://localhost/"
+    backend.settings["user"] = "user:password"
+    measure("MediaBackend.members (6 pages)", max(1, count // 100), lambda: backend.members("POMS_S_VPRO_123", batch=20))
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
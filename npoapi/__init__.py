@@ -15,3 +15,5 @@ from npoapi.media_backend_util import MediaBackendUtil
 from npoapi.transcoding_util import TranscodingUtil
 from npoapi.pages_backend import PagesBackend
 
+from npoapi.async_npoapi import AsyncMedia, AsyncSchedule, AsyncPages, AsyncSubtitles
+from npoapi.async_media_backend import AsyncMediaBackend
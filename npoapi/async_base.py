@@ -0,0 +1,86 @@
+import asyncio
+import urllib.error
+
+from npoapi import compression, request_body
+from npoapi.async_transport import AsyncConnectionPool, AsyncTransport
+
+
+class AsyncNpoApiBase(object):
+    """
+    Mixin for NpoApiBase subclasses, adding get_response_async: the coroutine counterpart of get_response. Requests are
+    executed with the AsyncConnectionPool of the running event loop, or the AsyncTransport set with async_transport().
+
+    Failover, hedging and coalescing are not supported: failover, hedged and coalesce raise TypeError. Requests always go
+    to the url of the environment. code and result() are those of the last request completed on the event loop's thread.
+    """
+    _async_transport = None
+
+    def failover(self, urls: list, failure_threshold: int = 3, reset_timeout: float = 30):
+        raise TypeError("%s does not support failover" % type(self).__name__)
+
+    def hedged(self, urls: list, **kwargs):
+        raise TypeError("%s does not support hedging" % type(self).__name__)
+
+    def coalesce(self, single_flight=True):
+        if single_flight not in (None, False):
+            raise TypeError("%s does not support coalescing" % type(self).__name__)
+        return super().coalesce(single_flight)
+
+    def async_transport(self, transport: AsyncTransport = None):
+        """Sets the npoapi.async_transport.AsyncTransport which executes all requests. Defaults to the
+        AsyncConnectionPool shared by all async clients on the running event loop"""
+        self._async_transport = transport
+        return self
+
+    async def get_response_async(self, req, url:str, ignore_not_found=False, timeout=None):
+        """Like NpoApiBase.get_response, but the returned response has a coroutine read(n) and close()"""
+        self._prepare(req)
+        not_found_key = self._not_found_key(req)
+        if self._cached_not_found(req, url, not_found_key):
+            return None
+        attempt = 0
+        while True:
+            try:
+                self.logger.debug("Executing %s %s", req.get_method(), url)
+                self.metrics.increment("requests")
+                return self._received(req, url, compression.async_decompressing(await self._open_compressed_async(req, timeout)))
+            except urllib.error.URLError as ue:
+                delay = self._failed(req, url, ue, attempt, ignore_not_found)
+                if delay is None:
+                    if not_found_key is not None and self.code == 404:
+                        self.not_found_cache.put(not_found_key, True, tags=self._not_found_tags(req))
+                    if isinstance(ue, urllib.error.HTTPError) and ue.code != 304 and not (ignore_not_found and ue.code == 404):
+                        self._log_error_body(req, url, ue, ue.read())
+                    return None
+                if hasattr(ue, "read"):
+                    ue.read()
+                    ue.close()
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _open_compressed_async(self, req, timeout=None):
+        data = req.data
+        if not compression.compress_request(req, self._compress_requests_threshold, self._no_request_compression):
+            return await self._open_url_async(req, timeout)
+        try:
+            return await self._open_url_async(req, timeout)
+        except urllib.error.HTTPError as he:
+            if he.code not in compression.REFUSED_CODES:
+                raise
+            self.logger.warning("%s refused compressed request (%s), sending it uncompressed", req.host, he.code)
+            self._no_request_compression.add(req.host)
+            req.data = data
+            req.remove_header("Content-encoding")
+            return await self._open_url_async(req, timeout)
+
+    async def _open_url_async(self, req, timeout=None):
+        if not request_body.rewind(req):
+            raise urllib.error.URLError("The request body was already sent, and can not be sent again")
+        if self.rate_limiter:
+            wait = self.rate_limiter.reserve()
+            if wait > 0:
+                self.metrics.increment("throttled")
+                self.metrics.increment("throttled_seconds", wait)
+                await asyncio.sleep(wait)
+        transport = self._async_transport if self._async_transport else AsyncConnectionPool.shared()
+        return await transport.urlopen(req, timeout=timeout)
@@ -0,0 +1,70 @@
+import asyncio
+import weakref
+
+from npoapi.async_base import AsyncNpoApiBase
+from npoapi.media_backend import MediaBackend
+
+
+class AsyncMediaBackend(AsyncNpoApiBase, MediaBackend):
+    """
+    MediaBackend for bulk imports. Posts and deletes (post, add_member, add_location, delete, ...) do not block, but
+    return an asyncio.Task which resolves to the response (e.g. the mid of a posted object), or None if the request failed.
+    At most max_in_flight of these requests are executed at the same time, the others wait in order of submission.
+    Get requests are executed synchronously, like in MediaBackend.
+
+    Must be used from a running event loop, e.g.:
+
+        mids = await asyncio.gather(*[backend.post(update) for update in updates])
+    """
+    __author__ = "Michiel Meeuwissen"
+
+    def __init__(self, env:str=None, email:str = None, debug:bool=False, accept:str=None, max_in_flight: int = 10):
+        super().__init__(env, email, debug, accept)
+        self.max_in_flight = max_in_flight
+        self._slots = weakref.WeakKeyDictionary()
+        self._pending = set()
+
+    def in_flight(self, max_in_flight: int):
+        """Sets the maximal number of posts and deletes that are executed concurrently"""
+        self.max_in_flight = max_in_flight
+        self._slots = weakref.WeakKeyDictionary()
+        return self
+
+    def pending(self) -> int:
+        """The number of submitted requests that are not finished yet"""
+        return len(self._pending)
+
+    async def join(self):
+        """Waits until all submitted requests are finished"""
+        while self._pending:
+            await asyncio.wait(list(self._pending))
+
+    def _request(self, req, url, accept="application/xml", needs_authentication=True, authorization=None, ignore_not_found=False):
+        if req.get_method() == "GET":
+            return super()._request(req, url, accept=accept, needs_authentication=needs_authentication,
+                                    authorization=authorization, ignore_not_found=ignore_not_found)
+        self._add_headers(req, accept, needs_authentication, authorization)
+        task = asyncio.get_running_loop().create_task(self._execute(req, url, ignore_not_found))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    async def _execute(self, req, url, ignore_not_found=False) -> str:
+        async with self._slot():
+            response = await self.get_response_async(req, url, ignore_not_found=ignore_not_found)
+            if not response:
+                return None
+            try:
+                result = (await response.read()).decode()
+            finally:
+                await response.close()
+        self.logger.debug("Found: %s", result)
+        return result
+
+    def _slot(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        slot = self._slots.get(loop)
+        if slot is None:
+            slot = asyncio.Semaphore(self.max_in_flight)
+            self._slots[loop] = slot
+        return slot
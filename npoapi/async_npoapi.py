@@ -0,0 +1,123 @@
+import asyncio
+
+from npoapi.async_base import AsyncNpoApiBase
+from npoapi.media import Media
+from npoapi.npoapi import NpoApi
+from npoapi.pages import Pages
+from npoapi.schedule import Schedule
+from npoapi.subtitles import Subtitles
+
+
+class AsyncNpoApi(AsyncNpoApiBase, NpoApi):
+    """
+    asyncio variant of NpoApi. request and stream are coroutines, so are therefore all methods of the clients that are
+    based on them (e.g. await AsyncMedia().get(mid)). Requests are signed, retried, rate limited and (de)compressed like
+    those of the synchronous clients. See AsyncNpoApiBase. Responses are not cached on disk: cache_responses raises
+    TypeError.
+    """
+    __author__ = "Michiel Meeuwissen"
+
+    def cache_responses(self, cache=True):
+        if cache not in (None, False):
+            raise TypeError("%s does not support caching responses on disk" % type(self).__name__)
+        return super().cache_responses(cache)
+
+    async def request(self, path, params=None, accept=None, data=None, hedge=False, content_type: str = None) -> str:
+        """Executes a request and return the result as a string"""
+        response = await self.stream(path, params, accept, data, content_type=content_type, hedge=hedge)
+        return await self._read_async(response)
+
+    async def execute(self, req, hedge=False) -> str:
+        """Executes an already built and signed request (see prepare) and returns the result as a string"""
+        return await self._read_async(await self.get_response_async(req, req.full_url))
+
+    async def _read_async(self, response) -> str:
+        if response:
+            self.logger.debug(response.headers)
+            try:
+                return (await response.read()).decode('utf-8')
+            finally:
+                await response.close()
+        else:
+            return ""
+
+    async def stream(self, path:str, params=None, accept=None, data=None, content_type:str=None, timeout=None, hedge=False):
+        req = self._build_request(path, params, accept, data, content_type)
+        return await self.get_response_async(req, req.full_url, timeout=timeout)
+
+    def _get_or_load(self, cache, key, load, tags=(), ttl: float = None):
+        return cache.get_or_load_async(key, load, tags=tags, ttl=ttl)
+
+    async def _items(self, response, prefix: str):
+        """Parses the items of the json array at prefix from the streamed response, closing it afterwards"""
+        import ijson
+        if response is None:
+            return
+        try:
+            async for item in ijson.items_async(response, prefix):
+                yield item
+        finally:
+            await response.close()
+
+
+class AsyncMedia(AsyncNpoApi, Media):
+    """Media with coroutines. changes and iterate with stream=True return async generators of the parsed objects"""
+    CHANGES_ITEMS = "changes.item"
+    ITERATE_ITEMS = "mediaobjects.item"
+
+    def changes(self, *args, stream=False, **kwargs):
+        result = super().changes(*args, stream=stream, **kwargs)
+        return self._items_of(result, AsyncMedia.CHANGES_ITEMS) if stream else result
+
+    def iterate(self, *args, stream=True, **kwargs):
+        result = super().iterate(*args, stream=stream, **kwargs)
+        return self._items_of(result, AsyncMedia.ITERATE_ITEMS) if stream else result
+
+    async def _items_of(self, response_coroutine, prefix: str):
+        async for item in self._items(await response_coroutine, prefix):
+            yield item
+
+    def resolve_redirects(self, refresh_interval: float = 3600):
+        """Not supported: the redirect list is loaded while resolving a mid, which can't await its request"""
+        if refresh_interval is not None:
+            raise TypeError("AsyncMedia can't resolve redirects")
+        return super().resolve_redirects(refresh_interval)
+
+    def follow_changes(self, *args, **kwargs):
+        """Not supported: the changes feed is followed in a thread, which can't await the requests"""
+        raise TypeError("AsyncMedia can't follow changes")
+
+    async def _multiple_cached(self, mids, properties=None, profile=None):
+        ids, items, generation = self._multiple_lookup(mids, properties, profile)
+        missing = [mid for mid in ids if items[mid] is None]
+        response = (await self._multiple_request(missing, properties, profile)) if missing else None
+        return self._multiple_result(ids, items, missing, response, properties, profile, generation)
+
+
+class AsyncSchedule(AsyncNpoApi, Schedule):
+    """Schedule with coroutines. prewarm runs at most max_workers gets concurrently"""
+
+    async def prewarm(self, start, stop, channels=(None,), properties=None, max_workers: int = 4) -> int:
+        slots = asyncio.Semaphore(max_workers)
+
+        async def get(guide_day, channel):
+            async with slots:
+                return await self.get(guideDay=guide_day, channel=channel, properties=properties)
+        results = await asyncio.gather(*[get(guide_day, channel)
+                                         for guide_day, channel in Schedule._guide_days(start, stop, channels)])
+        return sum(1 for result in results if result)
+
+
+class AsyncPages(AsyncNpoApi, Pages):
+    """Pages with coroutines. iterate returns an async generator of the parsed pages"""
+    ITERATE_ITEMS = "pages.item"
+
+    async def iterate(self, form="{}", profile=None, offset=0, limit=None):
+        response = await self.stream("/api/pages/iterate", data=form, accept="application/json",
+                                     params={"profile": profile, "offset": offset, "max": limit})
+        async for item in self._items(response, AsyncPages.ITERATE_ITEMS):
+            yield item
+
+
+class AsyncSubtitles(AsyncNpoApi, Subtitles):
+    pass
@@ -0,0 +1,369 @@
+import abc
+import asyncio
+import http.client
+import io
+import logging
+import ssl
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import weakref
+
+from npoapi import request_body
+from npoapi.connection_pool import MAX_REDIRECTS, redirect_request
+from npoapi.transport import WsgiTransport
+
+
+class AsyncTransport(object):
+    """
+    Executes urllib.request.Request objects from a coroutine. Like npoapi.transport.Transport, but urlopen and the read
+    and close methods of the response it returns are coroutines. Raises HTTPError for 4xx/5xx responses (with the body
+    already read) and URLError if the server could not be reached.
+
+    See AsyncConnectionPool and AsyncWsgiTransport.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    async def urlopen(self, req: urllib.request.Request, timeout: float = None):
+        pass
+
+    async def close(self):
+        pass
+
+
+class AsyncResponse(object):
+    """Response of the AsyncConnectionPool. The body is read from the connection with read(n), which is a coroutine."""
+
+    def __init__(self, url: str, status: int, reason: str, headers: http.client.HTTPMessage, reader: asyncio.StreamReader,
+                 release, timeout: float = None, has_body: bool = True):
+        self.url = url
+        self.status = self.code = status
+        self.reason = self.msg = reason
+        self.headers = headers
+        self.closed = False
+        self._reader = reader
+        self._release = release
+        self._timeout = timeout
+        self._chunked = "chunked" in headers.get("Transfer-Encoding", "").lower()
+        self._chunk_left = 0
+        length = headers.get("Content-Length")
+        self._length = int(length) if length is not None and not self._chunked else None
+        self._will_close = "close" in headers.get("Connection", "").lower() or (self._length is None and not self._chunked)
+        if not has_body:
+            self._length = 0
+            self._chunked = self._will_close = False
+        if self._length == 0:
+            self._finish(True)
+
+    def getcode(self) -> int:
+        return self.status
+
+    def getheader(self, name: str, default=None):
+        return self.headers.get(name, default)
+
+    def getheaders(self) -> list:
+        return list(self.headers.items())
+
+    async def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            result = bytearray()
+            while True:
+                data = await self.read(64 * 1024)
+                if not data:
+                    return bytes(result)
+                result += data
+        if self.closed or n == 0:
+            return b""
+        try:
+            if self._chunked:
+                return await self._read_chunked(n)
+            if self._length is not None:
+                data = await self._wait(self._reader.read(min(n, self._length)))
+                if not data:
+                    raise http.client.IncompleteRead(b"", self._length)
+                self._length -= len(data)
+                if self._length == 0:
+                    self._finish(not self._will_close)
+                return data
+            data = await self._wait(self._reader.read(n))
+            if not data:
+                self._finish(False)
+            return data
+        except BaseException:
+            self._finish(False)
+            raise
+
+    async def _read_chunked(self, n: int) -> bytes:
+        if self._chunk_left == 0:
+            line = await self._wait(self._reader.readline())
+            if not line:
+                raise http.client.IncompleteRead(b"")
+            self._chunk_left = int(line.split(b";", 1)[0], 16)
+            if self._chunk_left == 0:
+                # trailers
+                while line not in (b"\r\n", b"\n", b""):
+                    line = await self._wait(self._reader.readline())
+                self._finish(not self._will_close)
+                return b""
+        data = await self._wait(self._reader.read(min(n, self._chunk_left)))
+        if not data:
+            raise http.client.IncompleteRead(b"")
+        self._chunk_left -= len(data)
+        if self._chunk_left == 0:
+            await self._wait(self._reader.readexactly(2))
+        return data
+
+    async def _wait(self, coroutine):
+        if self._timeout is None:
+            return await coroutine
+        return await asyncio.wait_for(coroutine, self._timeout)
+
+    def _finish(self, reusable: bool):
+        self.closed = True
+        release, self._release = self._release, None
+        if release:
+            release(reusable)
+
+    async def close(self):
+        # if the body was not completely read, the connection cannot be used for a next request
+        self._finish(False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AsyncConnectionPool(AsyncTransport):
+    """
+    The asyncio counterpart of npoapi.connection_pool.ConnectionPool, on plain asyncio streams. Keeps HTTP/1.1
+    connections alive per scheme/host/port, with at most max_per_host of them in use at the same time, so one event loop
+    can have many requests in flight without opening a connection for every one of them. Like in ConnectionPool, a
+    request waits at most its timeout (or wait_timeout seconds) for a connection.
+
+    Proxies are not supported. An instance can only be used by one event loop, see shared().
+    """
+    __author__ = "Michiel Meeuwissen"
+
+    _shared = weakref.WeakKeyDictionary()
+
+    logger = logging.getLogger("ConnectionPool")
+
+    def __init__(self, max_per_host: int = 10, idle_timeout: float = 60, timeout: float = None,
+                 wait_timeout: float = 60):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.wait_timeout = wait_timeout
+        self.created = 0
+        self.reused = 0
+        self._idle = {}
+        self._slots = {}
+        self._ssl_context = None
+
+    @staticmethod
+    def shared():
+        """The pool that is used by all async clients by default, one per event loop"""
+        loop = asyncio.get_running_loop()
+        pool = AsyncConnectionPool._shared.get(loop)
+        if pool is None:
+            pool = AsyncConnectionPool()
+            AsyncConnectionPool._shared[loop] = pool
+        return pool
+
+    async def urlopen(self, req: urllib.request.Request, timeout: float = None) -> AsyncResponse:
+        if timeout is None:
+            timeout = self.timeout
+        if req.type not in ("http", "https"):
+            raise urllib.error.URLError("unknown url type: %s" % req.type)
+        for i in range(MAX_REDIRECTS + 1):
+            response = await self._open(req, timeout)
+            if response.status < 300:
+                return response
+            body = await response.read()
+            redirect = redirect_request(req, response.status, response.headers)
+            if redirect is None:
+                raise urllib.error.HTTPError(req.full_url, response.status, response.reason, response.headers, io.BytesIO(body))
+            req = redirect
+        raise urllib.error.HTTPError(req.full_url, response.status, "Too many redirects", response.headers, io.BytesIO(body))
+
+    async def _open(self, req, timeout):
+        key = (req.type, req.host)
+        slot = self._slot(key)
+        try:
+            await self._wait(slot.acquire(), self.wait_timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            raise urllib.error.URLError("No connection to %s available: %s responses are still open" %
+                                        (req.host, self.max_per_host))
+        try:
+            while True:
+                writer = None
+                reused = False
+                try:
+                    if not request_body.rewind(req):
+                        raise urllib.error.URLError("The request body was already sent, and can not be sent again")
+                    reader, writer, reused = await self._get_connection(key, timeout)
+                    await self._send(writer, req, timeout)
+                    status, reason, headers = await self._wait(self._read_head(reader), timeout)
+                    break
+                except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError) as e:
+                    self._close_quietly(writer)
+                    if not reused:
+                        raise urllib.error.URLError(e)
+                    # the server closed an idle connection. Just try again with a new one.
+                    self.logger.debug("Reused connection to %s was closed (%s), reconnecting", req.host, e)
+                except (OSError, asyncio.TimeoutError, ValueError, http.client.HTTPException) as e:
+                    self._close_quietly(writer)
+                    raise urllib.error.URLError(e)
+        except BaseException:
+            slot.release()
+            raise
+        return AsyncResponse(req.full_url, status, reason, headers, reader,
+                             lambda reusable: self._release(key, writer, reader, reusable), timeout=timeout,
+                             has_body=req.get_method() != "HEAD" and status not in (204, 304))
+
+    @staticmethod
+    async def _wait(coroutine, timeout):
+        if timeout is None:
+            return await coroutine
+        return await asyncio.wait_for(coroutine, timeout)
+
+    @staticmethod
+    def _close_quietly(writer):
+        if writer is not None:
+            writer.close()
+
+    async def _send(self, writer, req, timeout):
+        writer.write(self._request_head(req))
+        if request_body.is_stream(req.data):
+            for chunk in request_body.chunks(req.data):
+                writer.write(b"%x\r\n" % len(chunk))
+                writer.write(chunk)
+                writer.write(b"\r\n")
+                await self._wait(writer.drain(), timeout)
+            writer.write(b"0\r\n\r\n")
+        elif req.data is not None:
+            writer.write(req.data)
+        await self._wait(writer.drain(), timeout)
+
+    @staticmethod
+    def _request_head(req) -> bytes:
+        headers = dict(req.header_items())
+        lines = ["%s %s HTTP/1.1" % (req.get_method(), req.selector)]
+        if "Host" not in headers:
+            lines.append("Host: %s" % req.host)
+        if req.data is not None:
+            headers.setdefault("Content-type", "application/x-www-form-urlencoded")
+            length = request_body.content_length(req.data)
+            if length is None:
+                headers["Transfer-encoding"] = "chunked"
+            else:
+                headers["Content-length"] = str(length)
+        lines.extend("%s: %s" % (name, value) for name, value in headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader) -> (int, str, http.client.HTTPMessage):
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionResetError("Remote end closed connection without response")
+            version, _, rest = line.decode("latin-1").strip().partition(" ")
+            if not version.startswith("HTTP/"):
+                raise http.client.BadStatusLine(line)
+            code, _, reason = rest.partition(" ")
+            lines = []
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                lines.append(line)
+            if int(code) != 100:
+                return int(code), reason, http.client.parse_headers(io.BytesIO(b"".join(lines) + b"\r\n"))
+
+    def _slot(self, key) -> asyncio.Semaphore:
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = asyncio.BoundedSemaphore(self.max_per_host)
+            self._slots[key] = slot
+        return slot
+
+    async def _get_connection(self, key, timeout):
+        now = time.monotonic()
+        idle = self._idle.get(key, [])
+        while idle:
+            reader, writer, since = idle.pop()
+            if now - since < self.idle_timeout and not writer.is_closing() and not reader.at_eof():
+                self.reused += 1
+                return reader, writer, True
+            writer.close()
+        self.created += 1
+        scheme, host = key
+        url = urllib.parse.urlsplit("//" + host)
+        port = url.port or (443 if scheme == "https" else 80)
+        context = self._context() if scheme == "https" else None
+        reader, writer = await self._wait(asyncio.open_connection(url.hostname, port, ssl=context), timeout)
+        return reader, writer, False
+
+    def _context(self) -> ssl.SSLContext:
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    def _release(self, key, writer, reader, reusable):
+        if reusable and not writer.is_closing():
+            idle = self._idle.setdefault(key, [])
+            idle.append((reader, writer, time.monotonic()))
+            while len(idle) > self.max_per_host:
+                idle.pop(0)[1].close()
+        else:
+            writer.close()
+        self._slot(key).release()
+
+    async def close(self):
+        """Closes all idle connections"""
+        for idle in self._idle.values():
+            for reader, writer, since in idle:
+                writer.close()
+        self._idle = {}
+
+    def __str__(self):
+        return "AsyncConnectionPool(max_per_host=%s, idle_timeout=%s, created=%s, reused=%s)" % (
+            self.max_per_host, self.idle_timeout, self.created, self.reused)
+
+
+class _AsyncWsgiResponse(object):
+    """Makes read and close of a WsgiResponse awaitable"""
+
+    def __init__(self, response):
+        self.response = response
+
+    async def read(self, n: int = -1) -> bytes:
+        return self.response.read(n)
+
+    async def close(self):
+        self.response.close()
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+class AsyncWsgiTransport(AsyncTransport):
+    """Dispatches requests in process to a WSGI application, like npoapi.transport.WsgiTransport. The application itself
+    is called synchronously."""
+
+    def __init__(self, app):
+        self.transport = WsgiTransport(app)
+
+    @property
+    def requests(self) -> int:
+        return self.transport.requests
+
+    async def urlopen(self, req: urllib.request.Request, timeout: float = None):
+        return _AsyncWsgiResponse(self.transport.urlopen(req, timeout))
+
+    def __str__(self):
+        return "Async" + str(self.transport)
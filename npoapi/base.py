@@ -1,15 +1,25 @@
 import abc
 import argparse
-import codecs
 import copy
 import logging
 import os
 import sys
+import threading
+import time
 import urllib.request
 
 import pyxb
 
 import npoapi
+from npoapi import compression, request_body
+from npoapi.cache import LruCache
+from npoapi.connection_pool import ConnectionPool
+from npoapi.failover import Endpoints
+from npoapi.hedging import Hedging
+from npoapi.metrics import Metrics, Result
+from npoapi.retry import RetryPolicy
+from npoapi.single_flight import SingleFlight
+from npoapi.transport import Transport, UrllibTransport
 
 
 def declare_namespaces():
@@ -42,7 +52,7 @@ class NpoApiBase:
         Initializes logging, env-settings, and default accept headers.
         """
         self.force_create_config = False
-        self.code = None
+        self._local = threading.local()
 
         logging.basicConfig(format='%(levelname)s %(message)s')
         self.logger = logging.getLogger("Npo")
@@ -52,12 +62,36 @@ class NpoApiBase:
         self.env(env)
         self._accept = accept or "application/json"
         self.settings = {}
+        self._transport = ConnectionPool.shared()
+        self._compressed = False
+        self._compress_requests_threshold = None
+        self._no_request_compression = set()
+        self.retry_policy = RetryPolicy()
+        self.rate_limiter = None
+        self.single_flight = None
+        self.not_found_cache = None
+        self.metrics = Metrics()
+
+    @property
+    def code(self) -> int:
+        """The status code of the last request executed by the current thread (or an errno if it could not be executed)"""
+        return getattr(self._local, "code", None)
+
+    @code.setter
+    def code(self, code: int):
+        self._local.code = code
+
+    def result(self) -> Result:
+        """Status and headers of the last request executed by the current thread"""
+        return getattr(self._local, "result", None)
 
     @abc.abstractmethod
     def env(self, e):
         """"Sets environment"""
         self._env = e
         self.actualenv = self._env if self._env else "test"
+        self.endpoints = None
+        self.hedging = None
         return self
 
     def debug(self, arg=True):
@@ -71,6 +105,103 @@ class NpoApiBase:
             self._accept = "application/json"
         return self
 
+    def transport(self, transport: Transport = None):
+        """Sets the npoapi.transport.Transport which executes all requests. Defaults to the connection pool shared by all
+        clients."""
+        self._transport = transport if transport else ConnectionPool.shared()
+        return self
+
+    def connection_pool(self, pool=None):
+        """Sets the connection pool to execute requests with. Defaults to the pool shared by all clients. If False, every
+        request will open a new connection (using plain urllib.request.urlopen)"""
+        if pool is None:
+            pool = ConnectionPool.shared()
+        return self.transport(pool if pool else UrllibTransport())
+
+    def failover(self, urls: list, failure_threshold: int = 3, reset_timeout: float = 30):
+        """Multi endpoint mode. Requests go to the first of the given (equivalent) base urls that is healthy, and fail over
+        to the next ones on connection errors and 5xx responses. See npoapi.failover.Endpoints"""
+        self.endpoints = Endpoints(urls, failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+        self.url = self.endpoints.primary()
+        return self
+
+    def hedged(self, urls: list, **kwargs):
+        """Hedging mode for requests that are marked as hedgeable (by setting 'hedge' on the urllib request). If the
+        response from the first url is slow, the request is also sent to the next one. See npoapi.hedging.Hedging"""
+        self.hedging = Hedging(urls, **kwargs)
+        self.url = urls[0]
+        return self
+
+    def retries(self, policy=None):
+        """Sets the RetryPolicy for failed requests. Defaults to a RetryPolicy() which retries idempotent requests a few
+        times. If False, failing requests are not retried."""
+        if policy is None:
+            policy = RetryPolicy()
+        self.retry_policy = policy if policy else None
+        return self
+
+    def compressed(self, arg=True):
+        """Whether to ask the server for gzip/deflate compressed responses. They are decompressed while reading them."""
+        self._compressed = arg
+        return self
+
+    def compressed_requests(self, threshold: int = 8 * 1024):
+        """Request bodies of at least threshold bytes are gzip compressed before sending (Content-Encoding: gzip). If the
+        server refuses that, the body is sent again uncompressed, and further requests to that host won't be compressed.
+        None disables compression of requests."""
+        self._compress_requests_threshold = threshold
+        return self
+
+    def coalesce(self, single_flight=True):
+        """Identical GET requests executed concurrently (by several threads) share one request and its result. A
+        npoapi.single_flight.SingleFlight may be given to share it between clients. False disables coalescing."""
+        if single_flight is True:
+            single_flight = SingleFlight()
+        self.single_flight = single_flight if single_flight not in (None, False) else None
+        return self
+
+    def cache_not_found(self, max_size: int = 100000, ttl: float = 60):
+        """Remembers for ttl seconds which GET requests resulted 404 Not Found, so asking again for something that does
+        not exist (e.g. MediaBackend.get(mid, ignore_not_found=True)) does not cost a request. The number of such
+        requests is counted in metrics["not_found_cached"]. max_size 0 disables it"""
+        self.not_found_cache = LruCache(max_size, ttl) if max_size else None
+        return self
+
+    def _not_found_key(self, req):
+        """The key in the not_found_cache for the request, or None if it can't be cached"""
+        if self.not_found_cache is None or req.get_method() != "GET":
+            return None
+        return req.get_full_url(), req.get_header("Accept")
+
+    def _not_found_tags(self, req) -> list:
+        """The tags of the cached 404 of the request, to invalidate it with"""
+        return []
+
+    def _cached_not_found(self, req, url: str, key) -> bool:
+        """Whether the request is known to result 404. If so, it is registered like it was executed"""
+        if key is None or not self.not_found_cache.get(key):
+            return False
+        self.logger.debug("%s: known to be not found", url)
+        self.metrics.increment("not_found_cached")
+        self.code = 404
+        self._local.result = Result(req.get_method(), url, 404)
+        return True
+
+    def _coalesced(self, key, execute):
+        """Executes execute(), unless an identical request (with the same key) is in flight already"""
+        if self.single_flight is None:
+            return execute()
+
+        def call():
+            result = execute()
+            return result, self.code, self.result()
+        (result, code, last_result), shared = self.single_flight.do(key, call)
+        if shared:
+            self.metrics.increment("coalesced")
+            self.code = code
+            self._local.result = last_result
+        return result
+
     def read_environmental_variables(self):
         if self._env is None:
             if 'ENV' in os.environ:
@@ -229,6 +360,7 @@ class NpoApiBase:
         parent_args.add_argument('-u', "--url", type=str, default=None)
         parent_args.add_argument('-c', "--createconfig", action='store_true', help="Create config")
         parent_args.add_argument('-d', "--debug", action='store_true', help="Switch on debug logging")
+        parent_args.add_argument("--compressed", action='store_true', help="Request compressed responses")
         filtered_argv = []
         i = 0
         while i < len(sys.argv):
@@ -265,44 +397,121 @@ class NpoApiBase:
             self.accept(self.accept_choices().get(args.accept))
         else:
             self.accept()
+        if "compressed" in args and args.compressed:
+            self.compressed()
         return args
 
     def get_response(self, req, url:str, ignore_not_found=False, timeout=None):
-        """Error handling around urllib.request.urlopen"""
-        summary = "%s %s" % (req.method if hasattr(req, "method") else "'GET'" if not req.data else "'POST'", url)
-        try:
-            self.logger.debug("Executing %s", summary)
-            response = urllib.request.urlopen(req, timeout=timeout)
-            self.code = response.getcode()
-            self.logger.debug("headers: "  + str(response.headers))
-            self.logger.debug("response code: " + str(response.getcode()))
-            self.logger.debug("response headers: " + str(response.getheaders()))
-            return response
-        except urllib.error.URLError as ue:
-            error_type = str(type(ue))
-            self.logger.debug("headers: " + str(ue.headers))
-            if ignore_not_found and ue.code == 404:
-                self.logger.debug('%s: %s: %s (%s)', url,  summary, ue.reason, error_type)
-                self.code = 404
-                return None
-            if type(ue.reason) is str:
-                self.logger.error('%s: %s: %s (%s)', url, summary, ue.reason, error_type)
-                self.code = ue.code
-            else:
-                self.logger.error('%s: %s: %s %s (%s)', url, ue.reason.errno, summary, ue.reason.strerror, error_type)
-                self.code = ue.reason.errno
-            if hasattr(ue, "read"):
-                self.logger.error("%s: %s", url, ue.read().decode("utf-8"))
+        """Error handling around urllib.request.urlopen. Failed requests are retried according to the retry policy."""
+        self._prepare(req)
+        not_found_key = self._not_found_key(req)
+        if self._cached_not_found(req, url, not_found_key):
             return None
-        except urllib.error.HTTPError as he:
-            self.code = he.code
-            self.logger.error("%s: %s %s: %s\n%s", url, summary, he.code, he.msg, he.read().decode("utf-8"))
+        attempt = 0
+        while True:
+            try:
+                self.logger.debug("Executing %s %s", req.get_method(), url)
+                self.metrics.increment("requests")
+                return self._received(req, url, compression.decompressing(self._open_compressed(req, timeout)))
+            except urllib.error.URLError as ue:
+                delay = self._failed(req, url, ue, attempt, ignore_not_found)
+                if delay is None:
+                    if not_found_key is not None and self.code == 404:
+                        self.not_found_cache.put(not_found_key, True, tags=self._not_found_tags(req))
+                    if isinstance(ue, urllib.error.HTTPError) and ue.code != 304 and not (ignore_not_found and ue.code == 404):
+                        self._log_error_body(req, url, ue, ue.read())
+                    return None
+                if hasattr(ue, "read"):
+                    ue.read()
+                    ue.close()
+                attempt += 1
+                time.sleep(delay)
+
+    def _prepare(self, req):
+        if self._compressed and not req.has_header("Accept-encoding"):
+            req.add_header("Accept-Encoding", compression.ACCEPT_ENCODING)
+
+    def _received(self, req, url: str, response):
+        """Registers the successful response"""
+        self.code = response.getcode()
+        self._local.result = Result(req.get_method(), url, response.getcode(), response.headers)
+        self.logger.debug("headers: " + str(response.headers))
+        self.logger.debug("response code: " + str(response.getcode()))
+        self.logger.debug("response headers: " + str(response.getheaders()))
+        return response
+
+    def _failed(self, req, url: str, ue: urllib.error.URLError, attempt: int, ignore_not_found=False) -> float:
+        """Registers the failed request. Returns the delay after which it must be retried, or None if it must not be"""
+        method = req.get_method()
+        summary = "%s %s" % (method, url)
+        error_type = str(type(ue))
+        code = getattr(ue, "code", None)
+        self._local.result = Result(method, url, code, getattr(ue, "headers", None), ue)
+        if code == 304 or (ignore_not_found and code == 404):
+            self.logger.debug('%s: %s: %s (%s)', url,  summary, ue.reason, error_type)
+            self.code = code
+            ue.close()
             return None
+        delay = self.retry_policy.delay(method, ue, attempt) if self.retry_policy and request_body.replayable(req) else None
+        if delay is not None:
+            self.metrics.increment("retries")
+            self.logger.warning("%s: %s (%s). Retry %s in %.1f s", summary, ue.reason, code, attempt + 1, delay)
+            return delay
+        self.metrics.increment("failures")
+        if isinstance(ue, urllib.error.HTTPError):
+            self.code = ue.code
+        elif type(ue.reason) is str:
+            self.logger.error('%s: %s: %s (%s)', url, summary, ue.reason, error_type)
+            self.code = code
+        else:
+            errno = getattr(ue.reason, "errno", None)
+            self.logger.error('%s: %s: %s %s (%s)', url, errno, summary, getattr(ue.reason, "strerror", None) or ue.reason, error_type)
+            self.code = errno
+        return None
+
+    def _log_error_body(self, req, url: str, ue: urllib.error.HTTPError, body: bytes):
+        self.logger.error("%s: %s %s %s: %s\n%s", url, req.get_method(), url, ue.code, ue.msg,
+                          compression.decode_body(ue.headers, body).decode("utf-8"))
+
+    def _open(self, req, timeout=None):
+        if self.hedging and getattr(req, "hedge", False):
+            return self.hedging.open(req, lambda r: self._open_url(r, timeout), metrics=self.metrics)
+        if self.endpoints:
+            return self.endpoints.open(req, lambda r: self._open_url(r, timeout), metrics=self.metrics)
+        return self._open_url(req, timeout)
+
+    def _open_url(self, req, timeout=None):
+        if not request_body.rewind(req):
+            raise urllib.error.URLError("The request body was already sent, and can not be sent again")
+        if self.rate_limiter:
+            waited = self.rate_limiter.acquire()
+            if waited:
+                self.metrics.increment("throttled")
+                self.metrics.increment("throttled_seconds", waited)
+        return self._transport.urlopen(req, timeout=timeout)
+
+    def _open_compressed(self, req, timeout=None):
+        """Opens the request, with a gzip compressed body if configured, falling back to uncompressed if that is refused"""
+        data = req.data
+        if not compression.compress_request(req, self._compress_requests_threshold, self._no_request_compression):
+            return self._open(req, timeout)
+        try:
+            return self._open(req, timeout)
+        except urllib.error.HTTPError as he:
+            if he.code not in compression.REFUSED_CODES:
+                raise
+            he.read()
+            self.logger.warning("%s refused compressed request (%s), sending it uncompressed", req.host, he.code)
+            self._no_request_compression.add(req.host)
+            req.data = data
+            req.remove_header("Content-encoding")
+            return self._open(req, timeout)
 
     def data_to_bytes(self, data, content_type:str = None) -> [bytearray, str]:
         """
         Given some object representing API data returns it as a bytearray and a content type.
-        Recognized are pyxb bindings, a file name, or else a string.
+        Recognized are pyxb bindings, a file name, or else a string. Bytes, memoryviews and streams (binary file objects
+        and iterables of bytes, see npoapi.request_body) are returned as is. Files are memory mapped, not read.
         """
         if data:
             import pyxb
@@ -321,17 +530,12 @@ class NpoApiBase:
                     elif data.endswith(".xml"):
                         content_type = "application/xml"
 
-                self.logger.debug("" + data + " is file, reading it in as " + content_type)
-                with codecs.open(data, 'r', 'utf-8') as myfile:
-                    data = myfile.read()
-                    self.logger.debug("Found data " + data)
+                self.logger.debug("%s is file, mapping it as %s", data, content_type)
+                data = request_body.map_file(data)
             elif isinstance(data, str):
-                content_type = None
-                if data.startswith("{"):
-                    content_type = "application/json"
-                elif data.startswith("<"):
-                    content_type = "application/xml"
                 data = data.encode("utf-8")
+            if content_type is None:
+                content_type = request_body.sniff_content_type(data)
 
         return data, content_type
 
@@ -346,9 +550,8 @@ class NpoApiBase:
         """"""
         if os.path.isfile(data):
             self.logger.debug("" + data + " is file, reading it in")
-            with codecs.open(data, 'r', 'utf-8') as myfile:
-                data = myfile.read()
-                self.logger.debug("Found data " + data)
+            data = str(request_body.map_file(data), "utf-8")
+            self.logger.debug("Found data %s", data)
         else:
             self.logger.debug("" + data + " is not a file")
         return data
@@ -6,6 +6,7 @@ from xml.dom import minidom
 import pytz
 from npoapi.xml import mediaupdate
 
+from npoapi import request_body
 from npoapi.base import NpoApiBase
 
 
@@ -72,10 +73,7 @@ class BasicBackend(NpoApiBase):
 
 
     def _generate_basic_authorization(self, username, password):
-        password_manager = urllib.request.HTTPPasswordMgrWithDefaultRealm()
-        password_manager.add_password(None, self.url, username, password)
-        urllib.request.install_opener(
-            urllib.request.build_opener(urllib.request.HTTPBasicAuthHandler(password_manager)))
+        """The authorization header is sent with every request, so no (process global) urllib opener is needed for this"""
         base64string = base64.encodebytes(('%s:%s' % (username, password)).encode()).decode()[:-1]
         return "Basic %s" % base64string
 
@@ -97,15 +95,15 @@ class BasicBackend(NpoApiBase):
             raise Exception("Cant post without xml")
         bytes = self.xml_to_bytes(xml)
         req = urllib.request.Request(url, data=bytes, method='POST')
-        self.logger.debug("Posting " + str(bytes) + " to " + url)
+        self.logger.debug("Posting %s to %s", bytes, url)
         return self._request(req, url, accept=accept)
 
     def get_from(self, path:str, accept="application/xml", ignore_not_found=False, **kwargs) -> str:
         self._creds()
         _url = self.append_params(self.url + path, include_errors=False, **kwargs)
-        req = urllib.request.Request(_url)
         self.logger.debug("Getting from " + _url)
-        return self._request(req, _url, accept=accept, ignore_not_found=ignore_not_found)
+        return self._coalesced((self.authorizationHeader, _url, accept, ignore_not_found),
+                               lambda: self._request(urllib.request.Request(_url), _url, accept=accept, ignore_not_found=ignore_not_found))
 
     def delete_from(self, path: str, accept="text/plain", **kwargs) -> str:
         self._creds()
@@ -119,6 +117,7 @@ class BasicBackend(NpoApiBase):
         self._creds()
         self.logger.debug("getting " + url)
         req = urllib.request.Request(url)
+        req.add_header("Authorization", self.authorizationHeader)
         req.add_header("Accept", "application/xml")
         response = self.get_response(req, url)
         if response:
@@ -127,15 +126,7 @@ class BasicBackend(NpoApiBase):
             return None
 
     def _request(self, req, url, accept="application/xml", needs_authentication=True, authorization=None, ignore_not_found=False) -> str:
-        if needs_authentication:
-            if authorization:
-                req.add_header("Authorization", authorization)
-            else:
-                if not self.authorizationHeader:
-                    raise Exception("No user/password configured")
-                req.add_header("Authorization", self.authorizationHeader)
-        req.add_header("Content-Type", "application/xml")
-        req.add_header("Accept", accept)
+        self._add_headers(req, accept, needs_authentication, authorization)
         try:
             response = self.get_response(req, url, ignore_not_found=ignore_not_found)
             if response:
@@ -149,6 +140,17 @@ class BasicBackend(NpoApiBase):
             logging.error(e.read().decode())
             return None
 
+    def _add_headers(self, req, accept="application/xml", needs_authentication=True, authorization=None):
+        if needs_authentication:
+            if authorization:
+                req.add_header("Authorization", authorization)
+            else:
+                if not self.authorizationHeader:
+                    raise Exception("No user/password configured")
+                req.add_header("Authorization", self.authorizationHeader)
+        req.add_header("Content-Type", "application/xml")
+        req.add_header("Accept", accept)
+
     def info(self):
         return self.url
 
@@ -212,6 +214,8 @@ class BasicBackend(NpoApiBase):
             return self.toxml(xml)
         elif hasattr(xml, "toDOM"):
             return xml.toDOM().toxml('utf-8')
+        elif isinstance(xml, (bytes, bytearray, memoryview)) or request_body.is_stream(xml):
+            return xml
         else:
             raise Exception("unrecognized type " + str(t))
 
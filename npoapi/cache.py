@@ -0,0 +1,219 @@
+import asyncio
+import collections
+import logging
+import threading
+import time
+
+
+class LruCache(object):
+    """
+    Thread safe in memory cache of at most max_size entries. When it is full, the least recently used entry is evicted.
+    Entries expire ttl seconds after they were put (a ttl can also be given per entry, float("inf") never expires).
+    Entries can be tagged, to invalidate all entries with a certain tag at once (e.g. everything about a certain mid).
+
+    With max_stale, get_or_load serves stale-while-revalidate: an expired entry is still returned during max_stale
+    seconds, while it is loaded again in the background (once). After that, the caller has to wait for the load again.
+
+    A value that was loaded while its key (or one of its tags) was invalidated is not put, since it may be the old one.
+
+    hits, stale_hits, misses, refreshes, evictions and expirations are counted.
+    """
+    logger = logging.getLogger("Npo")
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300, max_stale: float = 0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = collections.OrderedDict()
+        self._tags = {}
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        # invalidation generations of recently invalidated keys and tags, to not put values that were loaded before
+        self._generation = 0
+        self._invalidations = collections.OrderedDict()
+        self._forgotten = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _now():
+        return time.monotonic()
+
+    def get(self, key, default=None):
+        """The value for the key, or default if it is not cached or expired"""
+        now = self._now()
+        with self._lock:
+            entry = self._lookup(key, now)
+            if entry is None or entry[1] <= now:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_or_load(self, key, load, tags=(), ttl: float = None):
+        """The value for the key. If it is not cached, it is load()-ed and put (unless it is empty). If it is expired
+        less than max_stale seconds ago, the stale value is returned, and load() runs in a background thread"""
+        entry, refresh, generation = self._load_state(key)
+        if entry is None:
+            value = load()
+            if value:
+                self.put(key, value, ttl=ttl, tags=tags, generation=generation)
+            return value
+        if refresh:
+            threading.Thread(target=self._refresh, args=(key, load, tags, ttl, generation), name="LruCache refresh",
+                             daemon=True).start()
+        return entry[0]
+
+    async def get_or_load_async(self, key, load, tags=(), ttl: float = None):
+        """get_or_load for coroutines: load() returns an awaitable, which is awaited before its value is put. Stale
+        values are refreshed in a task on the running event loop"""
+        entry, refresh, generation = self._load_state(key)
+        if entry is None:
+            value = await load()
+            if value:
+                self.put(key, value, ttl=ttl, tags=tags, generation=generation)
+            return value
+        if refresh:
+            task = asyncio.get_running_loop().create_task(self._refresh_async(key, load, tags, ttl, generation))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+        return entry[0]
+
+    def _load_state(self, key):
+        """The (possibly stale) entry for the key, whether it must be refreshed, and the current generation"""
+        now = self._now()
+        with self._lock:
+            entry = self._lookup(key, now)
+            refresh = False
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                if entry[1] > now:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                    refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+            return entry, refresh, self._generation
+
+    def _refresh(self, key, load, tags, ttl, generation):
+        try:
+            self._refreshed(key, load(), tags, ttl, generation)
+        except Exception as e:
+            self.logger.warning("Could not refresh %s: %s", key, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def _refresh_async(self, key, load, tags, ttl, generation):
+        try:
+            self._refreshed(key, await load(), tags, ttl, generation)
+        except Exception as e:
+            self.logger.warning("Could not refresh %s: %s", key, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refreshed(self, key, value, tags, ttl, generation):
+        if value and self.put(key, value, ttl=ttl, tags=tags, generation=generation):
+            with self._lock:
+                self.refreshes += 1
+
+    def _lookup(self, key, now):
+        """The entry for the key, unless it is expired longer than max_stale ago"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] + self.max_stale <= now:
+            self._remove(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    def generation(self) -> int:
+        """The current invalidation generation. Give it to put when the value is loaded, see put"""
+        with self._lock:
+            return self._generation
+
+    def put(self, key, value, ttl: float = None, tags=(), generation: int = None) -> bool:
+        """Puts the value. With the generation from before loading it, it is not put if the key or one of the tags was
+        invalidated meanwhile. Returns whether it was put"""
+        expires = self._now() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and self._invalidated_since(generation, key, tags):
+                return False
+            self._remove(key)
+            self._entries[key] = (value, expires, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            return True
+
+    def _invalidated_since(self, generation: int, key, tags) -> bool:
+        if generation < self._forgotten:
+            return True
+        return any(self._invalidations.get(invalidation, 0) > generation
+                   for invalidation in [("key", key)] + [("tag", tag) for tag in tags])
+
+    def _invalidated(self, invalidation):
+        """Records the generation of the invalidation (of a key or a tag). Only the last max_size ones are remembered,
+        loads from before older ones are not put at all"""
+        self._generation += 1
+        self._invalidations.pop(invalidation, None)
+        self._invalidations[invalidation] = self._generation
+        while len(self._invalidations) > max(self.max_size, 1):
+            self._forgotten = self._invalidations.popitem(last=False)[1]
+
+    def _remove(self, key) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+        return True
+
+    def invalidate(self, key) -> bool:
+        """Removes the entry for the key. Returns whether there was one"""
+        with self._lock:
+            self._invalidated(("key", key))
+            return self._remove(key)
+
+    def invalidate_tag(self, tag) -> int:
+        """Removes all entries with the tag. Returns how many there were"""
+        with self._lock:
+            self._invalidated(("tag", tag))
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._forgotten = self._generation
+            self._invalidations.clear()
+            self._entries.clear()
+            self._tags.clear()
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __str__(self):
+        return "LruCache(%s/%s entries, ttl %s s, %s hits, %s stale hits, %s misses, hit rate %.3f, %s refreshes, " \
+               "%s evictions, %s expirations)" % (len(self), self.max_size, self.ttl, self.hits, self.stale_hits,
+                                                  self.misses, self.hit_rate(), self.refreshes, self.evictions,
+                                                  self.expirations)
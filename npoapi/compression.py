@@ -0,0 +1,192 @@
+import gzip
+import io
+import zlib
+
+ACCEPT_ENCODING = "gzip, deflate"
+# only 415 Unsupported Media Type means the server can't handle the Content-Encoding. A 400 Bad Request can be about the
+# content itself, and falling back would send the request again
+REFUSED_CODES = {415}
+
+
+class Inflater(object):
+    """
+    Incrementally decompresses a gzip or deflate stream. Also deals with raw deflate streams (without zlib header) and
+    concatenated gzip members. Feed it input when needs_input(), and take output with inflate(max_length).
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self._decompressor = self._new_decompressor()
+        self._input = b""
+        self._started = False
+
+    def _new_decompressor(self):
+        if self.encoding == "deflate":
+            return zlib.decompressobj(zlib.MAX_WBITS)
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def needs_input(self) -> bool:
+        return not self._input and not (self._decompressor.eof and self._decompressor.unused_data)
+
+    def feed(self, data: bytes):
+        self._input = data
+
+    def inflate(self, max_length: int) -> bytes:
+        if not self._input and self._decompressor.eof:
+            # concatenated gzip members
+            self._input = self._decompressor.unused_data
+            self._decompressor = self._new_decompressor()
+        data, self._input = self._input, b""
+        try:
+            result = self._decompressor.decompress(data, max_length)
+        except zlib.error:
+            if self.encoding != "deflate" or self._started:
+                raise
+            # some servers send raw deflate streams, without zlib header
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            result = self._decompressor.decompress(data, max_length)
+        self._started = True
+        self._input = self._decompressor.unconsumed_tail
+        return result
+
+    def flush(self) -> bytes:
+        return self._decompressor.flush()
+
+
+class DecompressingResponse(io.RawIOBase):
+    """
+    Wraps a http response with a gzip or deflate Content-Encoding, and decompresses it while it is read. So the complete
+    body is never held in memory, and it can be fed to e.g. ijson directly.
+
+    read(n) and readinto(b) only return less than requested at the end of the stream. Other attributes (headers,
+    getcode(), status...) are those of the wrapped response.
+    """
+    CHUNK_SIZE = 16 * 1024
+
+    def __init__(self, response, encoding: str):
+        super().__init__()
+        self.response = response
+        self.encoding = encoding
+        self._inflater = Inflater(encoding)
+        self._pending = b""
+        self._offset = 0
+        self._eof = False
+
+    def _fill(self, size: int):
+        while self._offset >= len(self._pending) and not self._eof:
+            self._offset = 0
+            if self._inflater.needs_input():
+                data = self.response.read(DecompressingResponse.CHUNK_SIZE)
+                if not data:
+                    self._pending = self._inflater.flush()
+                    self._eof = True
+                    break
+                self._inflater.feed(data)
+            self._pending = self._inflater.inflate(max(size, DecompressingResponse.CHUNK_SIZE))
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        view = memoryview(b).cast("B")
+        count = 0
+        while count < len(view):
+            self._fill(len(view) - count)
+            available = len(self._pending) - self._offset
+            if available <= 0:
+                break
+            n = min(available, len(view) - count)
+            view[count:count + n] = self._pending[self._offset:self._offset + n]
+            self._offset += n
+            count += n
+        return count
+
+    def close(self):
+        if not self.closed:
+            self.response.close()
+        super().close()
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+class AsyncDecompressingResponse(object):
+    """Like DecompressingResponse, for responses with a coroutine read(n) (see npoapi.async_transport)"""
+
+    def __init__(self, response, encoding: str):
+        self.response = response
+        self.encoding = encoding
+        self._inflater = Inflater(encoding)
+        self._eof = False
+
+    async def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            result = bytearray()
+            while True:
+                data = await self.read(DecompressingResponse.CHUNK_SIZE)
+                if not data:
+                    return bytes(result)
+                result += data
+        while not self._eof:
+            if self._inflater.needs_input():
+                data = await self.response.read(DecompressingResponse.CHUNK_SIZE)
+                if not data:
+                    self._eof = True
+                    return self._inflater.flush()
+                self._inflater.feed(data)
+            result = self._inflater.inflate(n)
+            if result:
+                return result
+        return b""
+
+    async def close(self):
+        await self.response.close()
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+def content_encoding(headers) -> str:
+    encoding = headers.get("Content-Encoding") if headers else None
+    if encoding:
+        encoding = encoding.strip().lower()
+        if encoding in ("gzip", "x-gzip"):
+            return "gzip"
+        if encoding == "deflate":
+            return "deflate"
+    return None
+
+
+def decompressing(response):
+    """Wraps the response in a DecompressingResponse if the server compressed it"""
+    encoding = content_encoding(response.headers)
+    if encoding:
+        return DecompressingResponse(response, encoding)
+    return response
+
+
+def async_decompressing(response):
+    """Wraps the async response in an AsyncDecompressingResponse if the server compressed it"""
+    encoding = content_encoding(response.headers)
+    if encoding:
+        return AsyncDecompressingResponse(response, encoding)
+    return response
+
+
+def decode_body(headers, body: bytes) -> bytes:
+    """Decompresses a completely read body (e.g. of an error response) if needed"""
+    encoding = content_encoding(headers)
+    if encoding and body:
+        return DecompressingResponse(io.BytesIO(body), encoding).read()
+    return body
+
+
+def compress_request(req, threshold: int, excluded_hosts=()) -> bool:
+    """Gzips the body of the urllib request if it is at least threshold bytes. Returns whether it did"""
+    if threshold is None or req.host in excluded_hosts or req.has_header("Content-encoding"):
+        return False
+    if not isinstance(req.data, (bytes, bytearray, memoryview)) or memoryview(req.data).nbytes < threshold:
+        return False
+    req.data = gzip.compress(req.data, compresslevel=6)
+    req.add_header("Content-Encoding", "gzip")
+    return True
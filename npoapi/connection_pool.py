@@ -0,0 +1,185 @@
+import http.client
+import logging
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from npoapi import request_body
+from npoapi.transport import Transport
+
+REDIRECT_CODES = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 10
+
+
+def redirect_request(req: urllib.request.Request, status: int, headers) -> urllib.request.Request:
+    """The request to follow a redirect response with, or None if it should not be followed. Mimics
+    urllib.request.HTTPRedirectHandler"""
+    method = req.get_method()
+    location = headers.get("location") or headers.get("uri")
+    if location is None or status not in REDIRECT_CODES:
+        return None
+    if not (method in ("GET", "HEAD") or (status in (301, 302, 303) and method == "POST")):
+        return None
+    new_url = urllib.parse.urljoin(req.full_url, location)
+    new_headers = {k: v for k, v in req.headers.items() if k.lower() not in ("content-length", "content-type")}
+    return urllib.request.Request(new_url, headers=new_headers, method="HEAD" if method == "HEAD" else "GET")
+
+
+class _PooledResponse(http.client.HTTPResponse):
+    """HTTPResponse that hands its connection back to the pool once the body is consumed."""
+    _release = None
+    _reusable = True
+
+    def close(self):
+        if self.fp is not None:
+            # body not completely read, the connection cannot be used for a next request
+            self._reusable = False
+        super().close()
+
+    def _close_conn(self):
+        super()._close_conn()
+        release, self._release = self._release, None
+        if release:
+            release(self._reusable and not self.will_close)
+
+
+class ConnectionPool(Transport):
+    """
+    Keeps HTTP/1.1 connections to the API servers alive, so consecutive requests to the same host don't pay a new
+    TCP (and TLS) handshake. Connections are pooled per scheme/host/port. At most max_per_host connections are in use
+    per host at the same time, idle connections are closed after idle_timeout seconds. A connection is in use until
+    the body of its response is read or the response is closed. If all are in use, a request waits at most its timeout
+    (or wait_timeout seconds if it has none) for one, and then fails with URLError.
+
+    urlopen accepts a urllib.request.Request and behaves like urllib.request.urlopen (it raises HTTPError on 4xx/5xx
+    responses and URLError on connection problems), so it can be used as a drop in replacement.
+    """
+    __author__ = "Michiel Meeuwissen"
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    logger = logging.getLogger("ConnectionPool")
+
+    def __init__(self, max_per_host: int = 10, idle_timeout: float = 60, timeout: float = None,
+                 wait_timeout: float = 60):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.wait_timeout = wait_timeout
+        self.created = 0
+        self.reused = 0
+        self._idle = {}
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def shared():
+        """The pool that is used by all clients by default"""
+        with ConnectionPool._shared_lock:
+            if ConnectionPool._shared is None:
+                ConnectionPool._shared = ConnectionPool()
+            return ConnectionPool._shared
+
+    def urlopen(self, req: urllib.request.Request, timeout: float = None) -> http.client.HTTPResponse:
+        if timeout is None:
+            timeout = self.timeout
+        if req.type not in ("http", "https") or req.type in urllib.request.getproxies():
+            # let urllib deal with proxies and other schemes
+            return urllib.request.urlopen(req, timeout=timeout)
+        for i in range(MAX_REDIRECTS + 1):
+            response = self._open(req, timeout)
+            if response.status < 300:
+                return response
+            redirect = redirect_request(req, response.status, response.headers)
+            if redirect is None:
+                raise urllib.error.HTTPError(req.full_url, response.status, response.reason, response.headers, response)
+            response.read()
+            req = redirect
+        raise urllib.error.HTTPError(req.full_url, response.status, "Too many redirects", response.headers, response)
+
+    def _open(self, req, timeout):
+        key = (req.type, req.host)
+        headers = dict(req.header_items())
+        if req.data is not None and "Content-type" not in headers:
+            headers["Content-type"] = "application/x-www-form-urlencoded"
+        if not self._slot(key).acquire(timeout=self.wait_timeout if timeout is None else timeout):
+            raise urllib.error.URLError("No connection to %s available: %s responses are still open" %
+                                        (req.host, self.max_per_host))
+        try:
+            while True:
+                if not request_body.rewind(req):
+                    raise urllib.error.URLError("The request body was already sent, and can not be sent again")
+                connection, reused = self._get_connection(key, timeout)
+                try:
+                    connection.request(req.get_method(), req.selector, body=req.data, headers=headers)
+                    response = connection.getresponse()
+                    break
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                    connection.close()
+                    if not reused:
+                        raise urllib.error.URLError(e)
+                    # the server closed an idle connection. Just try again with a new one.
+                    self.logger.debug("Reused connection to %s was closed (%s), reconnecting", req.host, e)
+                except (OSError, http.client.HTTPException) as e:
+                    connection.close()
+                    raise urllib.error.URLError(e)
+        except BaseException:
+            self._slot(key).release()
+            raise
+        response.url = req.full_url
+        response._release = lambda reusable: self._release(key, connection, reusable)
+        return response
+
+    def _slot(self, key) -> threading.Semaphore:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.max_per_host)
+                self._slots[key] = slot
+            return slot
+
+    def _get_connection(self, key, timeout):
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                connection, since = idle.pop()
+                if now - since < self.idle_timeout and connection.sock is not None:
+                    self.reused += 1
+                    connection.timeout = timeout
+                    connection.sock.settimeout(timeout)
+                    return connection, True
+                connection.close()
+            self.created += 1
+        scheme, host = key
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(host, timeout=socket._GLOBAL_DEFAULT_TIMEOUT if timeout is None else timeout)
+        connection.response_class = _PooledResponse
+        return connection, False
+
+    def _release(self, key, connection, reusable):
+        with self._lock:
+            if reusable and connection.sock is not None:
+                idle = self._idle.setdefault(key, [])
+                idle.append((connection, time.monotonic()))
+                while len(idle) > self.max_per_host:
+                    idle.pop(0)[0].close()
+            else:
+                connection.close()
+        self._slot(key).release()
+
+    def close(self):
+        """Closes all idle connections"""
+        with self._lock:
+            for idle in self._idle.values():
+                for connection, since in idle:
+                    connection.close()
+            self._idle = {}
+
+    def __str__(self):
+        return "ConnectionPool(max_per_host=%s, idle_timeout=%s, created=%s, reused=%s)" % (
+            self.max_per_host, self.idle_timeout, self.created, self.reused)
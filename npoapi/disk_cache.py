@@ -0,0 +1,207 @@
+import collections
+import os
+import sqlite3
+import threading
+import time
+
+
+class DiskCache(object):
+    """
+    Persistent cache of api responses in a SQLite database, so it is shared by subsequent runs of the command line
+    clients (and by concurrent ones: several processes and threads can use the same file).
+
+    How long responses are cached depends on the endpoint: ttls maps path prefixes (like "/api/schedule") to a number
+    of seconds, the longest matching prefix applies. Paths without a match are cached for default_ttl seconds. A ttl of
+    0 means not caching at all. If the file grows beyond max_bytes, the least recently used responses are removed.
+
+    The validators (ETag and Last-Modified) of responses are stored too, so an expired response can be revalidated
+    with a conditional request. If it was not modified, refresh() makes it fresh again; the bytes that did not need
+    to be downloaded are counted in saved_bytes.
+
+    Like npoapi.cache.LruCache, responses can be tagged (with the mids they are about), to invalidate them by tag.
+    """
+    DEFAULT_TTLS = {
+        "/api/media/changes": 0,
+        "/api/media/iterate": 0,
+        "/api/pages/iterate": 0,
+        "/api/media/redirects": 3600,
+        "/api/schedule": 60,
+        "/api/subtitles": 3600
+    }
+    SCHEMA_VERSION = 3
+
+    def __init__(self, path: str = None, max_bytes: int = 100 * 1024 * 1024, ttls: dict = None, default_ttl: float = 300):
+        if path is None:
+            path = os.path.join(os.path.expanduser("~"), "conf", "npoapi-cache.sqlite")
+        elif os.path.isdir(path):
+            path = os.path.join(path, "npoapi-cache.sqlite")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DiskCache.DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+        self.saved_bytes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def ttl(self, path: str) -> float:
+        """The ttl for responses of the given api path (e.g. "/api/media/WO_VPRO_123")"""
+        prefixes = [prefix for prefix in self.ttls if path.startswith(prefix)]
+        return self.ttls[max(prefixes, key=len)] if prefixes else self.default_ttl
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            if connection.execute("PRAGMA user_version").fetchone()[0] != DiskCache.SCHEMA_VERSION:
+                self._create_schema(connection)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def _create_schema(connection):
+        """(Re)creates the tables, unless an other connection just did"""
+        with DiskCache._transaction(connection):
+            if connection.execute("PRAGMA user_version").fetchone()[0] == DiskCache.SCHEMA_VERSION:
+                return
+            connection.execute("DROP TABLE IF EXISTS responses")
+            connection.execute("DROP TABLE IF EXISTS tags")
+            connection.execute("CREATE TABLE responses (key TEXT PRIMARY KEY, body BLOB, size INTEGER, "
+                               "expires REAL, accessed REAL, etag TEXT, last_modified TEXT)")
+            connection.execute("CREATE INDEX responses_accessed ON responses (accessed)")
+            connection.execute("CREATE TABLE tags (tag TEXT, key TEXT, PRIMARY KEY (tag, key))")
+            connection.execute("CREATE INDEX tags_key ON tags (key)")
+            connection.execute("PRAGMA user_version = %d" % DiskCache.SCHEMA_VERSION)
+
+    @staticmethod
+    def _transaction(connection):
+        return _Transaction(connection)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def get(self, key: str) -> bytes:
+        """The cached response body, or None if it is not cached or expired"""
+        entry = self.lookup(key)
+        return entry.body if entry is not None and entry.fresh else None
+
+    def lookup(self, key: str) -> "CachedResponse":
+        """The cached response, also if it is expired (see CachedResponse.fresh), or None if it is not cached"""
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute("SELECT body, expires, etag, last_modified FROM responses WHERE key = ?",
+                                 (key,)).fetchone()
+        if row is None or row[1] <= now:
+            self._count("misses")
+        else:
+            connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._count("hits")
+        return None if row is None else CachedResponse(row[0], row[1] > now, row[2], row[3])
+
+    def put(self, key: str, body: bytes, ttl: float, etag: str = None, last_modified: str = None, tags=()):
+        if not ttl or len(body) > self.max_bytes:
+            return
+        connection = self._connection()
+        now = time.time()
+        with self._transaction(connection):
+            connection.execute("INSERT OR REPLACE INTO responses (key, body, size, expires, accessed, etag, last_modified) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?)", (key, body, len(body), now + ttl, now, etag, last_modified))
+            connection.execute("DELETE FROM tags WHERE key = ?", (key,))
+            connection.executemany("INSERT OR IGNORE INTO tags (tag, key) VALUES (?, ?)", [(tag, key) for tag in tags])
+            total = connection.execute("SELECT TOTAL(size) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(connection, total - self.max_bytes)
+
+    def refresh(self, key: str, ttl: float):
+        """Makes the cached response fresh again for ttl seconds, after the server confirmed it was not modified"""
+        connection = self._connection()
+        now = time.time()
+        with self._transaction(connection):
+            row = connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            connection.execute("UPDATE responses SET expires = ?, accessed = ? WHERE key = ?", (now + ttl, now, key))
+        if row is not None:
+            self._count("revalidations")
+            self._count("saved_bytes", row[0])
+
+    def _evict(self, connection, excess: int):
+        """Removes expired responses that can't be revalidated, and least recently used ones, until at least excess bytes
+        are freed"""
+        now = time.time()
+        keys = []
+        freed = 0
+        for key, size in connection.execute("SELECT key, size FROM responses "
+                                            "WHERE expires <= ? AND etag IS NULL AND last_modified IS NULL", (now,)):
+            keys.append(key)
+            freed += size
+        expired = set(keys)
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if freed >= excess:
+                break
+            if key not in expired:
+                keys.append(key)
+                freed += size
+        self._delete(connection, keys)
+        self._count("evictions", len(keys))
+
+    @staticmethod
+    def _delete(connection, keys: list):
+        connection.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
+        connection.executemany("DELETE FROM tags WHERE key = ?", [(key,) for key in keys])
+
+    def invalidate(self, key: str):
+        connection = self._connection()
+        with self._transaction(connection):
+            self._delete(connection, [key])
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Removes all responses with the tag. Returns how many there were"""
+        connection = self._connection()
+        with self._transaction(connection):
+            keys = [row[0] for row in connection.execute("SELECT key FROM tags WHERE tag = ?", (tag,))]
+            self._delete(connection, keys)
+        return len(keys)
+
+    def clear(self):
+        connection = self._connection()
+        with self._transaction(connection):
+            connection.execute("DELETE FROM responses")
+            connection.execute("DELETE FROM tags")
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def __str__(self):
+        return "DiskCache(%s, max %s bytes, %s hits, %s misses, %s evictions, %s revalidations saving %s bytes)" % (
+            self.path, self.max_bytes, self.hits, self.misses, self.evictions, self.revalidations, self.saved_bytes)
+
+
+CachedResponse = collections.namedtuple("CachedResponse", ["body", "fresh", "etag", "last_modified"])
+
+
+class _Transaction(object):
+    """Write transaction. Takes the database lock immediately, so concurrent writers wait for each other (at most the
+    timeout of the connection) instead of failing halfway"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute("COMMIT" if exc_type is None else "ROLLBACK")
@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+import urllib.error
+
+
+class CircuitBreaker(object):
+    """
+    Tracks the health of one endpoint. After failure_threshold consecutive failures the circuit 'opens', and the endpoint
+    is avoided for reset_timeout seconds. After that one trial request is allowed ('half open'). If that succeeds the
+    circuit closes again, otherwise it stays open for another reset_timeout.
+    """
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CircuitBreaker.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return CircuitBreaker.HALF_OPEN
+        return CircuitBreaker.OPEN
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now. In half open state only one trial request is allowed."""
+        with self._lock:
+            state = self.state
+            if state == CircuitBreaker.CLOSED:
+                return True
+            if state == CircuitBreaker.HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._trial or self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class Endpoint(object):
+    """One base url, with its circuit breaker and some statistics"""
+
+    def __init__(self, url: str, breaker: CircuitBreaker):
+        self.url = url
+        self.breaker = breaker
+        self.successes = 0
+        self.failures = 0
+        self.latency = None
+        self._lock = threading.Lock()
+
+    def record_success(self, elapsed: float):
+        with self._lock:
+            self.successes += 1
+            self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+        self.breaker.success()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+        self.breaker.failure()
+
+    def __str__(self):
+        return "%s (%s, %s ok, %s failed, latency %s)" % (
+            self.url, self.breaker.state, self.successes, self.failures,
+            "-" if self.latency is None else "%.3f s" % self.latency)
+
+
+class Endpoints(object):
+    """
+    A list of equivalent base urls, in order of preference. Requests go to the first endpoint whose circuit breaker
+    allows it, and fail over to the next ones on connection errors and 5xx responses.
+    """
+    logger = logging.getLogger("Npo")
+
+    def __init__(self, urls: list, failure_threshold: int = 3, reset_timeout: float = 30):
+        if not urls:
+            raise Exception("No urls given")
+        self.endpoints = [Endpoint(url, CircuitBreaker(failure_threshold, reset_timeout)) for url in urls]
+
+    def primary(self) -> str:
+        return self.endpoints[0].url
+
+    def relative(self, url: str):
+        """If url starts with one of the endpoint urls, returns the remaining part, otherwise None"""
+        for endpoint in self.endpoints:
+            if url.startswith(endpoint.url):
+                return url[len(endpoint.url):]
+        return None
+
+    def candidates(self):
+        """Yields the endpoints to try, in order. If all circuits are open, the one that opened first is still tried."""
+        tried = False
+        for endpoint in self.endpoints:
+            if endpoint.breaker.allow():
+                tried = True
+                yield endpoint
+        if not tried:
+            yield min(self.endpoints, key=lambda e: e.breaker.opened_at)
+
+    def open(self, req, opener, metrics=None):
+        """Opens the urllib request with opener(req), on the first endpoint that works"""
+        path = self.relative(req.full_url)
+        if path is None:
+            return opener(req)
+        error, failed = None, None
+        for endpoint in self.candidates():
+            if error is not None:
+                self._fail_over(failed, error, metrics)
+            req.full_url = endpoint.url + path
+            start = time.monotonic()
+            try:
+                response = opener(req)
+            except urllib.error.HTTPError as he:
+                if he.code < 500:
+                    # the endpoint is fine, the request is not
+                    endpoint.record_success(time.monotonic() - start)
+                    raise
+                endpoint.record_failure()
+                error, failed = he, endpoint
+            except urllib.error.URLError as ue:
+                endpoint.record_failure()
+                error, failed = ue, endpoint
+            else:
+                endpoint.record_success(time.monotonic() - start)
+                return response
+        raise error
+
+    def _fail_over(self, endpoint: Endpoint, error, metrics):
+        if hasattr(error, "read"):
+            error.read()
+            error.close()
+        self.logger.warning("%s failed (%s), failing over", endpoint.url, error.reason)
+        if metrics is not None:
+            metrics.increment("failovers")
+
+    def __str__(self):
+        return "\n".join(str(e) for e in self.endpoints)
@@ -0,0 +1,141 @@
+import collections
+import concurrent.futures
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+class LatencyTracker(object):
+    """Keeps the most recent latencies, to estimate a percentile of them"""
+
+    def __init__(self, window: int = 200):
+        self._latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def __len__(self):
+        return len(self._latencies)
+
+    def percentile(self, p: float) -> float:
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        return latencies[int(p * (len(latencies) - 1))]
+
+
+class Hedging(object):
+    """
+    Hedged requests: if the response of a request to the first url does not arrive within the delay, the same request
+    is also sent to the next url. Whichever responds first is used, the other one is cancelled (or discarded when it still
+    arrives). Connection errors and 5xx responses of the first request also trigger the hedge request immediately.
+
+    The delay is the given percentile of recently measured latencies, bounded by min_delay and max_delay. Until
+    min_samples latencies are known, initial_delay is used.
+    """
+    logger = logging.getLogger("Npo")
+
+    def __init__(self, urls: list, percentile: float = 0.95, min_delay: float = 0.01, max_delay: float = 2,
+                 initial_delay: float = 0.5, min_samples: int = 20, max_workers: int = 32):
+        if len(urls) < 2:
+            raise Exception("Hedging needs at least two urls")
+        self.urls = urls
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.latencies = LatencyTracker()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedging")
+
+    def delay(self) -> float:
+        if len(self.latencies) < self.min_samples:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, self.latencies.percentile(self.percentile)))
+
+    def hedge_rate(self) -> float:
+        """The fraction of requests for which a hedge request was sent"""
+        return self.hedges / self.requests if self.requests else 0.0
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _split(self, url: str):
+        for i, base in enumerate(self.urls):
+            if url.startswith(base):
+                return i, url[len(base):]
+        return None, None
+
+    def open(self, req, opener, metrics=None):
+        """Opens the urllib request with opener(req), hedging it if it is slow"""
+        index, path = self._split(req.full_url)
+        if path is None:
+            return opener(req)
+        self._count("requests")
+        start = time.monotonic()
+        primary = self._executor.submit(opener, req)
+        primary.add_done_callback(lambda f: self.latencies.record(time.monotonic() - start))
+        futures = [primary]
+        concurrent.futures.wait(futures, timeout=self.delay())
+        if not primary.done() or Hedging._failed(primary):
+            hedge_url = self.urls[(index + 1) % len(self.urls)] + path
+            self.logger.debug("Hedging %s to %s", req.full_url, hedge_url)
+            self._count("hedges")
+            if metrics is not None:
+                metrics.increment("hedges")
+            hedge = urllib.request.Request(hedge_url, data=req.data, headers=dict(req.header_items()), method=req.get_method())
+            futures.append(self._executor.submit(opener, hedge))
+        return self._first(futures)
+
+    def _first(self, futures: list):
+        """Returns the first response (or raises the first meaningful error) and discards the others"""
+        pending = list(futures)
+        error = None
+        while pending:
+            done, not_done = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            # in order of preference, so the primary wins a tie
+            for future in [f for f in pending if f in done]:
+                pending.remove(future)
+                if Hedging._failed(future):
+                    error = error or future.exception()
+                    continue
+                if future is not futures[0]:
+                    self._count("hedge_wins")
+                for other in pending:
+                    if not other.cancel():
+                        other.add_done_callback(Hedging._discard)
+                return future.result()
+        raise error
+
+    @staticmethod
+    def _failed(future) -> bool:
+        """Whether the request of the future failed in a way that the other url may do better"""
+        e = future.exception()
+        if e is None:
+            return False
+        if isinstance(e, urllib.error.HTTPError):
+            return e.code >= 500
+        return isinstance(e, urllib.error.URLError)
+
+    @staticmethod
+    def _discard(future):
+        if future.cancelled():
+            return
+        e = future.exception()
+        response = future.result() if e is None else e
+        if hasattr(response, "close"):
+            response.close()
+
+    def __str__(self):
+        return "Hedging(%s, delay %.3f s, %s requests, hedge rate %.3f, %s hedges won)" % (
+            " | ".join(self.urls), self.delay(), self.requests, self.hedge_rate(), self.hedge_wins)
@@ -0,0 +1,100 @@
+import json
+import logging
+import threading
+import time
+
+
+class ChangeFeedInvalidator(object):
+    """
+    Tails the changes feed of the media api (Media.changes) in a background thread, and invalidates the cached
+    media objects that changed or were deleted (see Media.invalidate). With refresh, changed objects that were cached
+    are requested again right away, so the next get is a hit again.
+
+    Without since it starts at the current time. Every interval seconds the feed is polled (immediately again as long
+    as full pages of limit changes are returned). polls, changes, invalidated, refreshed and errors are counted.
+
+    The feed is requested from the publish date of the last handled change on (inclusive), so changes at that same
+    publish date are requested again. As many as were handled already are skipped, and requested in addition to limit,
+    so even a bulk republish of more than limit objects at the same millisecond is followed.
+    """
+    logger = logging.getLogger("Npo")
+
+    def __init__(self, client, profile: str = None, since: str = None, interval: float = 5, limit: int = 100,
+                 refresh: bool = False):
+        self.client = client
+        self.profile = profile
+        self.since = since if since is not None else str(int(time.time() * 1000))
+        # the number of handled changes at since
+        self._seen = 0
+        self.interval = interval
+        self.limit = limit
+        self.refresh = refresh
+        self.polls = 0
+        self.changes = 0
+        self.invalidated = 0
+        self.refreshed = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="ChangeFeedInvalidator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                count = self.poll()
+            except Exception as e:
+                self.errors += 1
+                self.logger.warning("Could not follow changes since %s: %s", self.since, e)
+                count = 0
+            if count < self.limit:
+                self._stop.wait(self.interval)
+
+    def poll(self) -> int:
+        """Handles the next page of changes. Returns the number of new changes in it"""
+        self.polls += 1
+        since, skip = self.since, self._seen
+        response = self.client.changes(profile=self.profile, since=since, limit=self.limit + skip, deletes="ID_ONLY")
+        if not response:
+            self.errors += 1
+            return 0
+        count = 0
+        for change in json.loads(response).get("changes", []):
+            position = change.get("publishDate", change.get("sequence"))
+            position = None if position is None else str(position)
+            if change.get("tail"):
+                if position is not None and position != self.since:
+                    self.since, self._seen = position, 0
+                continue
+            if skip and position == since:
+                # handled by the previous poll
+                skip -= 1
+                continue
+            count += 1
+            if position is not None:
+                if position == self.since:
+                    self._seen += 1
+                else:
+                    self.since, self._seen = position, 1
+            mid = change.get("mid") or change.get("id")
+            if mid is None:
+                continue
+            self.changes += 1
+            removed = self.client.invalidate(mid)
+            self.invalidated += removed
+            if removed and self.refresh and not change.get("deleted"):
+                self.client.get(mid)
+                self.refreshed += 1
+        return count
+
+    def __str__(self):
+        return "ChangeFeedInvalidator(since %s, %s polls, %s changes, %s invalidated, %s refreshed, %s errors)" % (
+            self.since, self.polls, self.changes, self.invalidated, self.refreshed, self.errors)
@@ -1,34 +1,130 @@
-from npoapi.npoapi import NpoApi
-import urllib.request
+import json
 import os
+import urllib.parse
+import urllib.request
+
+from npoapi.cache import LruCache
+from npoapi.invalidator import ChangeFeedInvalidator
+from npoapi.npoapi import NpoApi
+from npoapi.redirects import RedirectResolver
 
 
 class Media(NpoApi):
+    media_cache = None
+    redirect_resolver = None
+    # paths below /api/media/ that are not about a mid
+    ENDPOINTS = {"changes", "iterate", "multiple", "redirects"}
+
+    def cached(self, max_size: int = 10000, ttl: float = 300, max_stale: float = 0):
+        """Caches the results of get and multiple in memory, see npoapi.cache.LruCache. max_size 0 disables caching.
+        With max_stale, get returns expired results (at most max_stale seconds) while refreshing them in the
+        background."""
+        self.media_cache = LruCache(max_size, ttl, max_stale=max_stale) if max_size else None
+        return self
+
+    def resolve_redirects(self, refresh_interval: float = 3600):
+        """Mids given to get and multiple are replaced by the mids they redirect to before requesting them, using a local
+        copy of the redirect list, see npoapi.redirects.RedirectResolver. None disables it"""
+        self.redirect_resolver = RedirectResolver(self, refresh_interval) if refresh_interval is not None else None
+        return self
+
+    def _resolve(self, mid: str) -> str:
+        return mid if self.redirect_resolver is None else self.redirect_resolver.resolve(mid)
+
     def get(self, mid, sub="", sort=None, accept=None, properties=None, limit=None, profile=None):
+        mid = self._resolve(mid)
+        if self.media_cache is None:
+            return self._get(mid, sub, sort, accept, properties, limit, profile)
+        key = (self.url, mid, sub, sort, properties, limit, profile, accept or self._accept)
+        return self._get_or_load(self.media_cache, key,
+                                 lambda: self._get(mid, sub, sort, accept, properties, limit, profile), tags=(mid,))
+
+    def invalidate(self, mid: str) -> int:
+        """Removes everything cached about mid, in memory (also that it was not found) and on disk. Returns the number of
+        removed entries. See also follow_changes"""
+        count = 0
+        if self.media_cache is not None:
+            count += self.media_cache.invalidate_tag(mid)
+        if self.not_found_cache is not None:
+            count += self.not_found_cache.invalidate_tag(mid)
+        if self.response_cache is not None:
+            count += self.response_cache.invalidate_tag(mid)
+        return count
+
+    def follow_changes(self, profile: str = None, since: str = None, interval: float = 5, refresh: bool = False):
+        """Starts a background thread that invalidates the cached media objects that change, see
+        npoapi.invalidator.ChangeFeedInvalidator. This keeps the caches fresh within seconds, so long ttls can be used"""
+        return ChangeFeedInvalidator(self, profile=profile, since=since, interval=interval, refresh=refresh).start()
+
+    def _cache_tags(self, path: str, params) -> list:
+        if path == "/api/media/multiple" and params and params.get("ids"):
+            return [mid.strip() for mid in params["ids"].split(",")]
+        if path.startswith("/api/media/"):
+            segment = path[len("/api/media/"):].split("/")[0]
+            if segment not in Media.ENDPOINTS:
+                return [urllib.parse.unquote(segment)]
+        return []
+
+    def _get(self, mid, sub="", sort=None, accept=None, properties=None, limit=None, profile=None):
         return self.request("/api/media/" + urllib.request.quote(mid, safe='') + sub,
                             params={"sort": sort, "properties": properties, "max": limit, "profile": profile},
-                            accept=accept)
+                            accept=accept, hedge=True)
 
     def multiple(self, mids, accept=None, properties=None, profile=None):
         if os.path.isfile(mids):
             return self.request("/api/media/multiple", data=mids,
                                 params={"properties": properties, "profile": profile}, accept=accept)
+        if self.redirect_resolver is not None:
+            mids = ",".join(self._resolve(mid.strip()) for mid in mids.split(","))
+        if self.media_cache is not None and (accept or self._accept) == "application/json":
+            return self._multiple_cached(mids, properties, profile)
         else:
             return self.request("/api/media/multiple",
-                                params={"ids": mids, "properties": properties, "profile": profile}, accept=accept)
+                                params={"ids": mids, "properties": properties, "profile": profile}, accept=accept,
+                                hedge=True)
+
+    def _multiple_cached(self, mids, properties=None, profile=None):
+        """Only requests the mids that are not cached. The result is composed of the cached and the requested items"""
+        ids, items, generation = self._multiple_lookup(mids, properties, profile)
+        missing = [mid for mid in ids if items[mid] is None]
+        response = self._multiple_request(missing, properties, profile) if missing else None
+        return self._multiple_result(ids, items, missing, response, properties, profile, generation)
+
+    def _multiple_lookup(self, mids, properties, profile):
+        """The requested ids, their cached items (or None) and the generation of the cache before requesting the rest"""
+        ids = [mid.strip() for mid in mids.split(",")]
+        items = {mid: self.media_cache.get((self.url, "multiple", mid, properties, profile)) for mid in ids}
+        return ids, items, self.media_cache.generation()
+
+    def _multiple_request(self, missing, properties, profile):
+        return self.request("/api/media/multiple",
+                            params={"ids": ",".join(missing), "properties": properties, "profile": profile}, hedge=True)
+
+    def _multiple_result(self, ids, items, missing, response, properties, profile, generation):
+        """Composes the result of the cached items and the response for the missing ones, which are cached"""
+        if missing:
+            if not response:
+                return response
+            for item in json.loads(response).get("items", []):
+                items[item.get("id")] = item
+                if item.get("result") is not None:
+                    self.media_cache.put((self.url, "multiple", item.get("id"), properties, profile), item,
+                                         tags=(item.get("id"),), generation=generation)
+        return json.dumps({"items": [items[mid] for mid in ids if items.get(mid) is not None]})
 
     def list(self):
         return self.request("/api/media")
 
-    def search(self, form="{}", sort="asc", offset=0, limit=240, profile=None, properties=None, accept=None, sub="descendants", mid=None):
+    def search(self, form="{}", sort="asc", offset=0, limit=240, profile=None, properties=None, accept=None, sub="descendants", mid=None,
+               content_type=None):
         if mid is None:
-            return self.request("/api/media", data=form, accept=accept,
+            return self.request("/api/media", data=form, accept=accept, content_type=content_type,
                                 params={"profile": profile, "sort": sort, "offset": offset, "max": limit, "properties": properties})
         else:
             if sub is None:
                 raise Exception("Should give sub when having mid")
             return self.request("/api/media/" + urllib.request.quote(mid) + "/" + sub, data=form, accept=accept,
-                                params={"profile": profile, "sort": sort, "offset": offset, "max": limit, "properties": properties})
+                                content_type=content_type, params={"profile": profile, "sort": sort, "offset": offset, "max": limit, "properties": properties})
 
     def changes(self, profile=None, order="ASC", stream=False, limit=10, since=None, force_oldstyle=False, properties=None, check_profile=True, deletes="ID_ONLY"):
         sinceLong = None
@@ -59,16 +155,16 @@ class Media(NpoApi):
                                 }
                 )
 
-    def redirects(self):
-        return self.request("/api/media/redirects")
+    def redirects(self, accept=None):
+        return self.request("/api/media/redirects", accept=accept)
 
-    def iterate(self, form=None, profile=None, stream=True, limit=100, timeout=None):
+    def iterate(self, form=None, profile=None, stream=True, limit=100, timeout=None, content_type=None):
         if not form:
             form = "{}"
         if stream:
-            return self.stream("/api/media/iterate", data=form,
+            return self.stream("/api/media/iterate", data=form, content_type=content_type,
                                params={"profile": profile, "max": limit}, timeout=timeout)
         else:
 
-            return self.request("/api/media/iterate", data=form,
+            return self.request("/api/media/iterate", data=form, content_type=content_type,
                                 params={"profile": profile, "max": limit})
@@ -1,8 +1,10 @@
-import codecs
+import asyncio
 import os
 import urllib.request
 from xml.dom import minidom
+from npoapi import request_body
 from npoapi.basic_backend import BasicBackend
+from npoapi.cache import LruCache
 from npoapi.xml import media, mediaupdate, poms
 import logging
 
@@ -10,6 +12,7 @@ import logging
 class MediaBackend(BasicBackend):
     """Client for NPO Backend API"""
     __author__ = "Michiel Meeuwissen"
+    backend_cache = None
 
     def __init__(self, env:str=None, email:str = None, debug:bool=False, accept:str=None):
         """
@@ -32,13 +35,54 @@ class MediaBackend(BasicBackend):
             self.url = e
         return self
 
+    def cached(self, max_size: int = 1000, ttl: float = 60):
+        """Caches the results of get, get_full, get_locations and get_images in memory (see npoapi.cache.LruCache), until
+        they are changed via this client (post, delete, add_location, add_image, add_member, ...). Changes by others are
+        only seen after ttl seconds. max_size 0 disables caching. For AsyncMediaBackend, the mids are invalidated when
+        the change is finished"""
+        self.backend_cache = LruCache(max_size, ttl) if max_size else None
+        return self
+
+    def _cached(self, mid: str, what: str, load):
+        if self.backend_cache is None:
+            return load()
+        return self.backend_cache.get_or_load((self.url, mid, what), load, tags=(mid,))
+
+    def invalidate(self, *mids):
+        """Forgets what is cached about the mids (by cached or cache_not_found)"""
+        for mid in mids:
+            if self.backend_cache is not None:
+                self.backend_cache.invalidate_tag(mid)
+            if self.not_found_cache is not None:
+                url = self.url + "media/media/" + urllib.request.quote(mid, safe='')
+                self.not_found_cache.invalidate((url, "application/xml"))
+                self.not_found_cache.invalidate((url + "/full", "application/xml"))
+
+    def _invalidating(self, result, *mids, posted: bool = False):
+        """Invalidates the mids after they were changed, and returns the result of the change. If it is an asyncio.Task
+        (of AsyncMediaBackend), that is when the task is done. With posted, the result is the mid of the posted object,
+        which is invalidated too"""
+        if isinstance(result, asyncio.Task):
+            result.add_done_callback(lambda task: self._changed(
+                None if task.cancelled() or task.exception() is not None else task.result(), mids, posted))
+        else:
+            self._changed(result, mids, posted)
+        return result
+
+    def _changed(self, result, mids, posted: bool):
+        self.invalidate(*mids)
+        if posted and isinstance(result, str):
+            self.invalidate(result.strip())
+
     def get(self, mid: str, ignore_not_found=False) -> str:
         """Returns XML-representation of a mediaobject"""
-        return self.get_from("media/media/" + urllib.request.quote(mid, safe=''), ignore_not_found=ignore_not_found)
+        return self._cached(mid, "", lambda: self.get_from("media/media/" + urllib.request.quote(mid, safe=''),
+                                                           ignore_not_found=ignore_not_found))
 
     def get_full(self, mid: str, ignore_not_found=False) -> str:
         """Returns XML-representation of a mediaobject"""
-        return self.get_from("media/media/" + urllib.request.quote(mid, safe='') + "/full", ignore_not_found=ignore_not_found)
+        return self._cached(mid, "full", lambda: self.get_from("media/media/" + urllib.request.quote(mid, safe='') + "/full",
+                                                               ignore_not_found=ignore_not_found))
 
     def get_object(self, mid: str, ignore_not_found=False) -> mediaupdate:
         """Returns pyxb-representation of a mediaobject"""
@@ -51,11 +95,13 @@ class MediaBackend(BasicBackend):
     def post(self, update, lookupcrid=True, raw=False, validate_input=False):
         if not raw:
             update = self.to_object(update, validate=True)
-        return self.post_to("media/media/", update, accept="text/plain", errors=self.get_errors(), lookupcrid=lookupcrid, validateInput=str(validate_input).lower())
+        result = self.post_to("media/media/", update, accept="text/plain", errors=self.get_errors(), lookupcrid=lookupcrid, validateInput=str(validate_input).lower())
+        mid = getattr(update, "mid", None)
+        return self._invalidating(result, *([str(mid)] if mid else []), posted=True)
 
     def delete(self, mid:str):
         """"""
-        return self.delete_from("media/media/" + urllib.request.quote(mid, safe=''))
+        return self._invalidating(self.delete_from("media/media/" + urllib.request.quote(mid, safe='')), mid)
 
 
     def _parkpost_authentication(self):
@@ -92,14 +138,14 @@ class MediaBackend(BasicBackend):
 
     def delete_member(self, mid, owner_mid):
         path = "media/media/" + urllib.request.quote(mid) + "/memberOf/" + urllib.request.quote(owner_mid)
-        self.delete_from(path)
+        return self._invalidating(self.delete_from(path), mid, owner_mid)
 
     def add_member(self, mid, owner_mid, position=None, highlighted=False):
         memberOf = mediaupdate.memberRef(owner_mid)
         memberOf.position = position
         memberOf.highlighted = highlighted
         path = "media/media/" + urllib.request.quote(mid) + "/memberOf/"
-        self.post_to(path, memberOf, accept="application/xml")
+        return self._invalidating(self.post_to(path, memberOf, accept="application/xml"), mid, owner_mid)
 
     # private method to implement both members and episodes calls.
     def members_or_episodes(self, mid:str, what:str, limit:int=None, batch:int=20, log_progress=False, log_indent="") -> list:
@@ -139,8 +185,7 @@ class MediaBackend(BasicBackend):
                       publishStart=None, publishStop=None):
         if os.path.isfile(programUrl):
             self.logger.debug(programUrl + " seems to be a local file")
-            with codecs.open(programUrl, "r", "utf-8") as myfile:
-                xml = myfile.read()
+            xml = request_body.map_file(programUrl)
         else:
             if not format:
                 format = self.guess_format(programUrl)
@@ -172,8 +217,8 @@ class MediaBackend(BasicBackend):
 
             xml += "</location >"
 
-        self.logger.debug("posting " + xml)
-        return self.post_to("media/media/" + mid + "/location", xml, accept="text/plain")
+        self.logger.debug("posting %s", xml)
+        return self._invalidating(self.post_to("media/media/" + mid + "/location", xml, accept="text/plain"), mid)
 
     def date_attr(self, name:str, datetime):
         if datetime:
@@ -182,10 +227,10 @@ class MediaBackend(BasicBackend):
             return ""
 
     def add_image(self, mid:str, image):
-        return self.post_to("media/media/" + mid + "/image", image, accept="text/plain")
+        return self._invalidating(self.post_to("media/media/" + mid + "/image", image, accept="text/plain"), mid)
 
     def add_location(self, mid: str, location):
-        return self.post_to("media/media/" + mid + "/location", location, accept="text/plain")
+        return self._invalidating(self.post_to("media/media/" + mid + "/location", location, accept="text/plain"), mid)
 
 
     def set_location(self, mid, location, publishStop=None, publishStart=None, programUrl=None):
@@ -233,13 +278,13 @@ class MediaBackend(BasicBackend):
 
         location_xml = location_object.toxml()
         self.logger.debug("Found " + location_xml)
-        return self.post_to("media/media/" + mid + "/location", location_xml, accept="text/plain")
+        return self._invalidating(self.post_to("media/media/" + mid + "/location", location_xml, accept="text/plain"), mid)
 
     def get_locations(self, mid:str):
-        return self.get_sub(mid, "locations")
+        return self._cached(mid, "locations", lambda: self.get_sub(mid, "locations"))
 
     def get_images(self, mid:str):
-        return self.get_sub(mid, "images")
+        return self._cached(mid, "images", lambda: self.get_sub(mid, "images"))
 
     def get_sub(self, mid:str, sub: str):
         self._creds()
@@ -0,0 +1,37 @@
+import collections
+import threading
+
+
+class Metrics(collections.Counter):
+    """Counters of a client (requests, retries, failovers, ...). increment is safe to use from several threads."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    def increment(self, key: str, amount=1):
+        with self._lock:
+            self[key] += amount
+
+    def ratio(self, key: str, total_key: str) -> float:
+        """E.g. ratio('hits', 'lookups')"""
+        total = self[total_key]
+        return self[key] / total if total else 0.0
+
+
+class Result(object):
+    """The outcome of one executed request: its status and headers, or the error if it failed"""
+
+    def __init__(self, method: str, url: str, status: int = None, headers=None, error: Exception = None):
+        self.method = method
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.status is not None and 200 <= self.status < 300
+
+    def __str__(self):
+        return "%s %s: %s" % (self.method, self.url, self.status if self.error is None else "%s (%s)" % (self.status, self.error))
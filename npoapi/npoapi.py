@@ -5,7 +5,10 @@ import json
 import urllib.request
 from email import utils
 
+from npoapi import rate_limit, request_body
 from npoapi.base import NpoApiBase
+from npoapi.disk_cache import DiskCache
+from npoapi.prepared import PreparedRequest
 
 
 class NpoApi(NpoApiBase):
@@ -20,6 +23,26 @@ class NpoApi(NpoApiBase):
     Credentials are read from a config file. If such a file does not exist it will offer to create one.
     """
 
+    ENVIRONMENTS = {
+        "prod": "https://rs.poms.omroep.nl/v1",
+        "proda": "https://rs-a.poms.omroep.nl/v1",
+        "prodb": "https://rs-b.poms.omroep.nl/v1",
+        "test": "https://rs-test.poms.omroep.nl/v1",
+        "testa": "https://rs-a-test.poms.omroep.nl/v1",
+        "testb": "https://rs-b-test.poms.omroep.nl/v1",
+        "dev": "https://rs-dev.poms.omroep.nl/v1",
+        "localhost": "http://localhost:8070/v1"
+    }
+    # separate nodes serving the same environment, in order of preference
+    NODES = {
+        "prod": ["proda", "prodb"],
+        "proda": ["proda", "prodb"],
+        "prodb": ["prodb", "proda"],
+        "test": ["testa", "testb"],
+        "testa": ["testa", "testb"],
+        "testb": ["testb", "testa"]
+    }
+
     def __init__(self, key: str = None, secret: str = None, env: str = None, origin: str = None,
                  debug: bool = False, accept: str = None):
         """
@@ -27,6 +50,8 @@ class NpoApi(NpoApiBase):
         """
         super().__init__(env=env, debug=debug, accept=accept)
         self.key, self.secret, self.origin = key, secret, origin
+        self._normalize_json = False
+        self.response_cache = None
 
     def login(self, key, secret, origin = None):
         self.key = key
@@ -37,38 +62,64 @@ class NpoApi(NpoApiBase):
 
     def env(self, e):
         super().env(e)
-        if e == "prod":
-            self.url = "https://rs.poms.omroep.nl/v1"
-        elif e == "proda":
-            self.url = "https://rs-a.poms.omroep.nl/v1"
-        elif e == "prodb":
-            self.url = "https://rs-b.poms.omroep.nl/v1"
-        elif e == "testa":
-            self.url = "https://rs-a-test.poms.omroep.nl/v1"
-        elif e == "testb":
-            self.url = "https://rs-b-test.poms.omroep.nl/v1"
-        elif e == None or e == "test":
-            self.url = "https://rs-test.poms.omroep.nl/v1"
-        elif e == "dev":
-            self.url = "https://rs-dev.poms.omroep.nl/v1"
-        elif e == "localhost":
-            self.url = "http://localhost:8070/v1"
-        else:
-            self.url = e
+        self.url = NpoApi.ENVIRONMENTS.get(e if e else "test", e)
         return self
 
+    def nodes(self) -> list:
+        """The urls of the separate nodes of the current environment"""
+        nodes = NpoApi.NODES.get(self.actualenv)
+        if nodes is None:
+            raise Exception("No separate nodes known for %s" % self.actualenv)
+        return [NpoApi.ENVIRONMENTS[n] for n in nodes]
 
-    def info(self):
-        return self.key + "@" + self.url
+    def failover(self, urls: list = None, failure_threshold: int = 3, reset_timeout: float = 30):
+        """Multi endpoint mode. If no urls are given, the separate nodes of the current environment (e.g. proda and prodb
+        for prod) are used."""
+        return super().failover(urls or self.nodes(), failure_threshold=failure_threshold, reset_timeout=reset_timeout)
 
-    def authenticate(self, uri="", now=utils.formatdate()):
-        if self.origin is None:
-            self.origin = self.get_setting("origin", "Your NPO api origin")
+    def hedged(self, urls: list = None, **kwargs):
+        """Hedges latency critical requests (Media.get, Media.multiple) over the separate nodes of the current environment,
+        or over the given urls. The hedge rate is available via self.hedging.hedge_rate()"""
+        return super().hedged(urls or self.nodes(), **kwargs)
+
+    def rate_limit(self, rate: float, capacity: float = None, directory: str = None):
+        """Limits the number of requests per second with the api key of this client. The limit is shared by all clients
+        with the same key in this process, and if directory is given, by all processes using that directory.
+        See npoapi.rate_limit"""
         if self.key is None:
             self.key = self.get_setting("apiKey", "Your NPO api key")
-        if self.secret is None:
-            self.secret = self.get_setting("secret", "Your NPO api secret")
+        self.rate_limiter = rate_limit.for_key(self.key, rate, capacity=capacity, directory=directory)
+        return self
 
+    def cache_responses(self, cache=True):
+        """Caches the responses of GET requests on disk, so they survive this process. cache is a DiskCache, a directory
+        or file to keep it in, True for the default (~/conf/npoapi-cache.sqlite), or None/False to switch caching off"""
+        if cache is True:
+            cache = DiskCache()
+        elif isinstance(cache, str):
+            cache = DiskCache(cache)
+        self.response_cache = None if cache is False else cache
+        return self
+
+    def common_arguments(self, description=None, exclude_arguments=None):
+        super().common_arguments(description=description, exclude_arguments=exclude_arguments)
+        self.add_argument("--cache", nargs="?", const=True, default=None, metavar="DIRECTORY",
+                          help="Cache responses on disk (in ~/conf or the given directory), shared by subsequent calls")
+        return self
+
+    def parse_args(self):
+        args = super().parse_args()
+        if args.cache:
+            self.cache_responses(args.cache)
+        return args
+
+    def info(self):
+        return self.key + "@" + self.url
+
+    def authenticate(self, uri="", now=None):
+        self._check_credentials()
+        if now is None:
+            now = utils.formatdate()
 
         message = "origin:" + self.origin + ",x-npo-date:" + now + ",uri:/v1" + uri
         self.logger.debug("message: " + message)
@@ -76,21 +127,42 @@ class NpoApi(NpoApiBase):
             hmac.new(self.secret.encode('utf-8'), msg=message.encode('utf-8'), digestmod=hashlib.sha256).digest())
         return "NPO " + self.key + ":" + encoded.decode('utf-8'), now
 
+    def _check_credentials(self):
+        if self.origin is None:
+            self.origin = self.get_setting("origin", "Your NPO api origin")
+        if self.key is None:
+            self.key = self.get_setting("apiKey", "Your NPO api key")
+        if self.secret is None:
+            self.secret = self.get_setting("secret", "Your NPO api secret")
+
     def _get_url(self, path, params=None):
-        if not params:
-            params = {}
+        query, authentication_params = self._query(params)
+        url = self.url + path + query
+        return url, path + authentication_params
 
-        path_for_authentication = path
-        if params.items():
+    @staticmethod
+    def _query(params) -> (str, str):
+        """The query string for params, and how the params are represented in the uri to authenticate"""
+        query = ""
+        authentication_params = ""
+        if params:
             sep = "?"
             for k, v in sorted(params.items()):
                 if v is not None:
-                    path += sep + k + "=" + urllib.request.quote(str(v))
-                    path_for_authentication += "," + k + ":" + str(v)
+                    query += sep + k + "=" + urllib.request.quote(str(v))
+                    authentication_params += "," + k + ":" + str(v)
                     sep = "&"
+        return query, authentication_params
 
-        url = self.url + path
-        return url, path_for_authentication
+    def prepare(self, path: str, accept: str = None, hedge: bool = False, **params) -> PreparedRequest:
+        """
+        Prepares a request to be executed many times. path is a template like "/api/media/{mid}", params are the constant
+        query parameters. The returned PreparedRequest executes the request when called with the values for the path:
+
+            get = client.prepare("/api/media/{mid}", properties="title", profile="vpro")
+            get(mid="WO_VPRO_783763")
+        """
+        return PreparedRequest(self, path, accept=accept, hedge=hedge, params=params)
 
     def _authentication_headers(self, req, path_for_authentication):
         authorization, date = self.authenticate(path_for_authentication)
@@ -100,48 +172,122 @@ class NpoApi(NpoApiBase):
 
         self.logger.debug("url: " + str(req.get_full_url()))
 
-    def _get_data(self, data:str = None, content_type:str =None) -> [bytearray, str]:
-        """Automaticly determins the content_type if it is not set"""
+    def _get_data(self, data = None, content_type:str =None) -> [bytearray, str]:
+        """Determines the content_type if it is not set. Json is only decoded and encoded again if normalize_json is set.
+        Streams that can't be sniffed (iterables) are supposed to be json, like the forms of the frontend api"""
         if data is None:
-            pass
-        elif type(data) == str:
-            if content_type is not None:
-                return data.encode("UTF-8"), content_type
+            return None, None
+        if isinstance(data, str):
+            data = data.encode("UTF-8")
+        if self._normalize_json and content_type in (None, "application/json") and not request_body.is_stream(data):
             try:
-                json_object = json.JSONDecoder(strict=False).decode(data)
+                json_object = json.JSONDecoder(strict=False).decode(bytes(data).decode("UTF-8"))
                 return json.JSONEncoder().encode(json_object).encode("UTF-8"), "application/json"
             except json.JSONDecodeError as je:
-                if data.startswith("<"):
-                    self.logger.debug("Data looks like xml, taking content type accordingly (%s)", str(je))
-                    return data.encode("UTF-8"), "application/xml"
-                else:
-                    self.logger.warn("Data %s could not be parsed as json. Leaving content type unspecified", data)
-                    return data.encode("UTF-8"), None
-        else:
-            self.logger.warn("Input %s is not a string", data)
+                self.logger.warning("Data could not be parsed as json (%s)", str(je))
+        if content_type is None:
+            content_type = request_body.sniff_content_type(data)
+            if content_type is None and request_body.is_stream(data):
+                content_type = "application/json"
+            elif content_type is None:
+                self.logger.warning("Could not determine content type of data. Leaving content type unspecified")
+        return data, content_type
 
-        return None,None
+    def normalize_json(self, arg=True):
+        """Whether json request bodies are parsed and serialized again before sending them. This validates them, but
+        costs a few copies of the body"""
+        self._normalize_json = arg
+        return self
 
-    def request(self, path, params=None, accept=None, data=None) -> str:
+    def request(self, path, params=None, accept=None, data=None, hedge=False, content_type: str = None) -> str:
         """Executes a request and return the result as a string"""
-        response = self.stream(path, params, accept, data)
+        if data is None and self.response_cache is not None:
+            return self._cached_request(path, params, accept, hedge)
+        if data is None and self.single_flight is not None:
+            self._check_credentials()
+            key = (self.key, self.url + path, self._query(params)[0], accept or self._accept)
+            return self._coalesced(key, lambda: self._read(self.stream(path, params, accept, hedge=hedge)))
+        response = self.stream(path, params, accept, data, content_type=content_type, hedge=hedge)
+        return self._read(response)
+
+    def _cached_request(self, path, params, accept, hedge) -> str:
+        """GET via the response cache. Only successful responses are stored. Expired responses are revalidated if the
+        server gave validators for them (If-None-Match/If-Modified-Since), and reused if it answers 304 Not Modified"""
+        # the key may still have to be read from the settings, and responses are cached per key
+        self._check_credentials()
+        url = self.url + path + self._query(params)[0]
+        key = "%s %s %s" % (self.key, accept or self._accept, url)
+        cached = self.response_cache.lookup(key)
+        if cached is not None and cached.fresh:
+            self.code = 200
+            return cached.body.decode("utf-8")
+        headers = {}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached is not None and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+        def fetch():
+            response = self.stream(path, params, accept, hedge=hedge, headers=headers)
+            if not response:
+                return None
+            return response.read(), response.headers.get("ETag"), response.headers.get("Last-Modified")
+        fetched = self._coalesced(key, fetch)
+        ttl = self._cache_ttl(path, params)
+        if self.code == 304 and cached is not None:
+            self.response_cache.refresh(key, ttl)
+            self.code = 200
+            return cached.body.decode("utf-8")
+        if fetched is None:
+            return ""
+        body, etag, last_modified = fetched
+        if self.code == 200:
+            self.response_cache.put(key, body, ttl, etag=etag, last_modified=last_modified,
+                                    tags=self._cache_tags(path, params))
+        return body.decode("utf-8")
+
+    def _get_or_load(self, cache, key, load, tags=(), ttl: float = None):
+        """The value for key in the in memory cache, load()-ed if needed. See npoapi.cache.LruCache.get_or_load"""
+        return cache.get_or_load(key, load, tags=tags, ttl=ttl)
+
+    def _cache_ttl(self, path: str, params) -> float:
+        """How long the response for path is cached, see npoapi.disk_cache.DiskCache.ttl"""
+        return self.response_cache.ttl(path)
+
+    def _cache_tags(self, path: str, params) -> list:
+        """The tags of the cached response for path, to invalidate it with (see npoapi.disk_cache.DiskCache)"""
+        return []
+
+    def _not_found_tags(self, req) -> list:
+        url = req.full_url.split("?")[0]
+        return self._cache_tags(url[len(self.url):], None) if url.startswith(self.url) else []
+
+    def execute(self, req: urllib.request.Request, hedge=False) -> str:
+        """Executes an already built and signed request (see prepare) and returns the result as a string"""
+        req.hedge = hedge
+        return self._read(self.get_response(req, req.full_url))
+
+    def _read(self, response) -> str:
         if response:
             self.logger.debug(response.headers)
             return response.read().decode('utf-8')
         else:
             return ""
 
-    def stream(self, path:str, params=None, accept=None, data=None, content_type:str=None, timeout=None):
+    def stream(self, path:str, params=None, accept=None, data=None, content_type:str=None, timeout=None, hedge=False,
+               headers: dict = None):
+        req = self._build_request(path, params, accept, data, content_type)
+        req.hedge = hedge
+        for name, value in (headers or {}).items():
+            req.add_header(name, value)
+        return self.get_response(req, req.full_url, timeout=timeout)
 
+    def _build_request(self, path:str, params=None, accept=None, data=None, content_type:str=None) -> urllib.request.Request:
+        """The signed urllib request for the given path and parameters"""
         data, content_type = self.data_to_bytes(data, content_type)
-        if not data is None:
-            data_as_string = data.decode("utf-8")
-        else:
-            data_as_string = None
-
         url, path_for_authentication = self._get_url(path, params)
 
-        d, content_type = self._get_data(data_as_string, content_type=content_type)
+        d, content_type = self._get_data(data, content_type=content_type)
         req = urllib.request.Request(url, data=d)
 
         if content_type:
@@ -150,5 +296,4 @@ class NpoApi(NpoApiBase):
         self._authentication_headers(req, path_for_authentication)
         req.add_header("Accept", accept if accept else self._accept)
         self.logger.debug("headers: " + str(req.headers))
-        return self.get_response(req, url, timeout)
-
+        return req
@@ -0,0 +1,57 @@
+import base64
+import hashlib
+import hmac
+import time
+import urllib.request
+from email import utils
+
+
+class PreparedRequest(object):
+    """
+    A frontend api request of which everything that is the same for every call is computed once: the query string and
+    its representation in the signed uri, the HMAC keyed with the secret and already fed with the origin, and the
+    headers. Created by NpoApi.prepare.
+
+    Calling it with values for the fields of the path template executes the request like NpoApi.request. The values
+    are quoted like path segments. Credentials, environment and accept header are taken from the client when preparing,
+    so changing them afterwards requires preparing again.
+    """
+
+    def __init__(self, client, path: str, accept: str = None, hedge: bool = False, params: dict = None):
+        client._check_credentials()
+        self.client = client
+        self.path = path
+        self.hedge = hedge
+        self._base = client.url
+        self._query, self._authentication_params = client._query(params)
+        self._hmac = hmac.new(client.secret.encode('utf-8'), msg=("origin:" + client.origin + ",x-npo-date:").encode('utf-8'),
+                              digestmod=hashlib.sha256)
+        self._authorization_prefix = "NPO " + client.key + ":"
+        self._headers = {"Origin": client.origin, "Accept": accept if accept else client._accept}
+        self._date = (None, None)
+
+    def _now(self) -> str:
+        """The X-NPO-Date header, formatted at most once per second"""
+        second = int(time.time())
+        formatted_second, date = self._date
+        if second != formatted_second:
+            date = utils.formatdate(second)
+            self._date = (second, date)
+        return date
+
+    def build(self, **values) -> urllib.request.Request:
+        """The signed request for the given values of the path template"""
+        path = self.path.format(**{k: urllib.request.quote(str(v), safe='') for k, v in values.items()}) if values else self.path
+        date = self._now()
+        mac = self._hmac.copy()
+        mac.update((date + ",uri:/v1" + path + self._authentication_params).encode('utf-8'))
+        headers = dict(self._headers)
+        headers["Authorization"] = self._authorization_prefix + base64.b64encode(mac.digest()).decode('utf-8')
+        headers["X-NPO-Date"] = date
+        return urllib.request.Request(self._base + path + self._query, headers=headers)
+
+    def __call__(self, **values) -> str:
+        return self.client.execute(self.build(**values), hedge=self.hedge)
+
+    def __str__(self):
+        return "PreparedRequest(%s%s%s)" % (self._base, self.path, self._query)
@@ -0,0 +1,209 @@
+"""
+Compiles api profiles (npoapi.xml.profile) into python predicates over media objects as returned (as json) by the
+frontend api. So one unfiltered stream of media objects (e.g. Media.changes or Media.iterate without profile) can be
+filtered locally for several profiles:
+
+    predicates = {name: compile_profile(xml) for name, xml in profiles.items()}
+    for change in changes:
+        for name in matching(change["media"], predicates):
+            ...
+
+The constraints of api_constraint_media (filter, and, or, not, broadcaster, avType, hasLocation, ...) are evaluated
+like the api does, as far as they can be on the json of the media object.
+"""
+import datetime
+
+import pytz
+
+from npoapi.xml import api_constraint_media, profile
+
+ZONE = pytz.timezone("Europe/Amsterdam")
+
+
+def compile_profile(definition):
+    """The predicate(media: dict) -> bool for a profile. definition is the xml of a profile, or the parsed
+    profile.profileType, its profile.profileDefinitionType (mediaProfile) or its api_constraint_media.filter_. A profile
+    without media filter accepts all media"""
+    if isinstance(definition, (str, bytes)):
+        definition = profile.CreateFromDocument(definition)
+    if isinstance(definition, profile.profileType):
+        definition = definition.mediaProfile
+    if isinstance(definition, profile.profileDefinitionType):
+        definition = definition.filter
+    if definition is None:
+        return lambda media: True
+    if not isinstance(definition, api_constraint_media.filter_):
+        raise ValueError("Not a media profile: %s" % type(definition))
+    return _compile_children(definition, all)
+
+
+def matching(media: dict, predicates: dict) -> list:
+    """The names of the predicates (by name) the media object matches"""
+    return [name for name, predicate in predicates.items() if predicate(media)]
+
+
+def _compile(name: str, constraint):
+    compiler = _COMPILERS.get(name)
+    if compiler is None:
+        raise ValueError("Unsupported constraint %s" % name)
+    return compiler(constraint)
+
+
+def _compile_children(constraint, combine):
+    predicates = [_compile(content.elementDeclaration.name().localName(), content.value)
+                  for content in constraint.orderedContent() if hasattr(content, "elementDeclaration")]
+    if len(predicates) == 1:
+        return predicates[0]
+    if combine is all:
+        return lambda media: all(predicate(media) for predicate in predicates)
+    return lambda media: any(predicate(media) for predicate in predicates)
+
+
+def _not(constraint):
+    predicate = _compile_children(constraint, all)
+    return lambda media: not predicate(media)
+
+
+def _ids(values) -> list:
+    """The identifying strings of a list of json values, which are strings or objects like {"id": "VPRO", "value": "VPRO"}"""
+    result = []
+    for value in values or ():
+        if isinstance(value, dict):
+            value = value.get("id") or value.get("midRef") or value.get("portalId") or value.get("value")
+        if value is not None:
+            result.append(str(value))
+    return result
+
+
+def _equals_field(field: str):
+    def compiler(constraint):
+        expected = str(constraint).upper()
+        return lambda media: str(media.get(field) or "").upper() == expected
+    return compiler
+
+
+def _in_list(field: str):
+    def compiler(constraint):
+        expected = str(constraint).upper()
+        return lambda media: expected in (value.upper() for value in _ids(media.get(field)))
+    return compiler
+
+
+def _not_empty(field: str):
+    return lambda constraint: lambda media: bool(media.get(field))
+
+
+def _on_platform(field: str):
+    def compiler(constraint):
+        platform = constraint.platform
+        if platform is None:
+            return lambda media: bool(media.get(field))
+        platform = str(platform)
+        return lambda media: any(item.get("platform") == platform for item in media.get(field) or ())
+    return compiler
+
+
+def _locations(media: dict):
+    return media.get("locations") or ()
+
+
+def _av_file_format(constraint):
+    expected = str(constraint).upper()
+    return lambda media: any(str(location.get("avFileFormat") or "").upper() == expected for location in _locations(media))
+
+
+def _av_file_extension(constraint):
+    extension = "." + str(constraint).lower()
+    return lambda media: any(str(location.get("programUrl") or "").lower().endswith(extension)
+                             for location in _locations(media))
+
+
+def _program_url(constraint):
+    url = constraint.value()
+    if constraint.exact:
+        return lambda media: any(location.get("programUrl") == url for location in _locations(media))
+    return lambda media: any(str(location.get("programUrl") or "").startswith(url) for location in _locations(media))
+
+
+def _descendant_of(constraint):
+    mid = str(constraint)
+    return lambda media: any(mid in (d.get("midRef"), d.get("urnRef")) for d in media.get("descendantOf") or ())
+
+
+def _genre(constraint):
+    expected = str(constraint)
+    if expected.endswith("*"):
+        prefix = expected[:-1]
+        return lambda media: any(genre.startswith(prefix) for genre in _ids(media.get("genres")))
+    return lambda media: expected in _ids(media.get("genres"))
+
+
+def _age_rating(constraint):
+    """Age ratings are like "_16" in xml, and "16" in json"""
+    expected = str(constraint).upper().lstrip("_")
+    return lambda media: str(media.get("ageRating") or "").upper().lstrip("_") == expected
+
+
+def _channel(constraint):
+    expected = str(constraint)
+    return lambda media: any(event.get("channel") == expected for event in media.get("scheduleEvents") or ())
+
+
+_OPERATORS = {
+    "LT": lambda a, b: a < b,
+    "LTE": lambda a, b: a <= b,
+    "GT": lambda a, b: a > b,
+    "GTE": lambda a, b: a >= b,
+    "EQ": lambda a, b: a == b
+}
+
+
+def _schedule_event(constraint):
+    """Whether a schedule event of the media object starts on a date (in the Netherlands) matching date and operator"""
+    date = datetime.date.fromisoformat(str(constraint.date)[:10])
+    operator = _OPERATORS[str(constraint.operator or "EQ")]
+
+    def predicate(media):
+        for event in media.get("scheduleEvents") or ():
+            start = event.get("start")
+            if start is not None and operator(datetime.datetime.fromtimestamp(start / 1000, ZONE).date(), date):
+                return True
+        return False
+    return predicate
+
+
+def _geo_restriction(constraint):
+    region = constraint.value()
+    platform = None if constraint.platform is None else str(constraint.platform)
+    return lambda media: any(_ids([restriction]) == [region] and (platform is None or restriction.get("platform") == platform)
+                             for restriction in media.get("geoRestrictions") or ())
+
+
+_COMPILERS = {
+    "and": lambda constraint: _compile_children(constraint, all),
+    "or": lambda constraint: _compile_children(constraint, any),
+    "not": _not,
+    "avType": _equals_field("avType"),
+    "type": _equals_field("type"),
+    "ageRating": _age_rating,
+    "broadcaster": _in_list("broadcasters"),
+    "portal": _in_list("portals"),
+    "exclusive": _in_list("exclusives"),
+    "contentRating": _in_list("contentRatings"),
+    "avFileFormat": _av_file_format,
+    "avFileExtension": _av_file_extension,
+    "programUrl": _program_url,
+    "descendantOf": _descendant_of,
+    "genre": _genre,
+    "channel": _channel,
+    "scheduleEvent": _schedule_event,
+    "geoRestriction": _geo_restriction,
+    "hasImage": _not_empty("images"),
+    "hasPortal": _not_empty("portals"),
+    "isExclusive": _not_empty("exclusives"),
+    "hasGeoRestriction": _not_empty("geoRestrictions"),
+    "hasAgeRating": _not_empty("ageRating"),
+    "hasContentRating": _not_empty("contentRatings"),
+    "hasLocation": _on_platform("locations"),
+    "hasPrediction": _on_platform("predictions"),
+}
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Token bucket rate limiter. Tokens are added at rate per second, up to capacity (the maximal burst). Every request
+    takes one token, and waits if there is none. Waiting requests reserve their token, so they are served in order.
+
+    This one is thread safe, and shared by threads of one process. See FileTokenBucket to share it between processes.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._timestamp = self._now()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _now():
+        return time.monotonic()
+
+    def _take(self, tokens: float, state: tuple) -> (float, tuple):
+        """Given the state (tokens, timestamp), takes tokens. Returns the time to wait and the new state"""
+        available, timestamp = state
+        now = self._now()
+        available = min(self.capacity, available + (now - timestamp) * self.rate) - tokens
+        wait = -available / self.rate if available < 0 else 0.0
+        return wait, (available, now)
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Takes tokens without waiting. Returns the number of seconds the caller must wait before using them (e.g. with
+        asyncio.sleep)"""
+        with self._lock:
+            wait, (self._tokens, self._timestamp) = self._take(tokens, (self._tokens, self._timestamp))
+            return wait
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Takes tokens, waiting until they are available. Returns the number of seconds waited."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def __str__(self):
+        return "%s(rate=%s/s, capacity=%s)" % (type(self).__name__, self.rate, self.capacity)
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    TokenBucket of which the state is kept in a (tiny) file, which is locked while it is updated. All processes on the same
+    host using the same file share the bucket. Requires fcntl (so not available on windows).
+    """
+
+    def __init__(self, rate: float, path: str, capacity: float = None):
+        super().__init__(rate, capacity)
+        self.path = path
+
+    @staticmethod
+    def _now():
+        return time.time()
+
+    def reserve(self, tokens: float = 1) -> float:
+        import fcntl
+        with self._lock, open(self.path, "a+") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                state = self._read_state(f.read())
+                wait, (available, timestamp) = self._take(tokens, state)
+                f.seek(0)
+                f.truncate()
+                f.write("%r %r\n" % (available, timestamp))
+                f.flush()
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return wait
+
+    def _read_state(self, content: str) -> tuple:
+        try:
+            available, timestamp = content.split()
+            return float(available), float(timestamp)
+        except ValueError:
+            return self.capacity, self._now()
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def for_key(key: str, rate: float, capacity: float = None, directory: str = None) -> TokenBucket:
+    """
+    The token bucket for an api key. Clients in this process using the same key share it. If directory is given the bucket
+    is kept in a file there, and shared with all processes using the same directory.
+    """
+    path = None
+    if directory:
+        path = os.path.join(directory, "npoapi-ratelimit-%s" % hashlib.sha256(key.encode("utf-8")).hexdigest()[:16])
+    with _buckets_lock:
+        bucket = _buckets.get((key, path))
+        if bucket is None or bucket.rate != rate or bucket.capacity != (capacity if capacity is not None else max(1.0, rate)):
+            bucket = FileTokenBucket(rate, path, capacity) if path else TokenBucket(rate, capacity)
+            _buckets[(key, path)] = bucket
+        return bucket
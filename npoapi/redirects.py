@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+
+from npoapi.xml import api
+
+
+class RedirectResolver(object):
+    """
+    Local copy of the redirect list of the media api (Media.redirects), to resolve retired mids to the ones they redirect
+    to without requests. Chains of redirects are collapsed to their final target.
+
+    The list is downloaded when it is first needed, and again in the background when it is older than refresh_interval
+    seconds (meanwhile the old list is used). rewrites and refreshes are counted.
+    """
+    logger = logging.getLogger("Npo")
+
+    def __init__(self, client, refresh_interval: float = 3600):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.rewrites = 0
+        self.refreshes = 0
+        self.last_change = None
+        self._redirects = None
+        self._loaded = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _now():
+        return time.monotonic()
+
+    def resolve(self, mid: str) -> str:
+        """The mid that mid (eventually) redirects to, or mid itself if it does not redirect"""
+        target = self._table().get(mid)
+        if target is None:
+            return mid
+        self.rewrites += 1
+        self.logger.debug("%s redirects to %s", mid, target)
+        return target
+
+    def _table(self) -> dict:
+        if self._redirects is None:
+            with self._lock:
+                if self._redirects is None:
+                    self.refresh()
+        elif self._loaded + self.refresh_interval <= self._now():
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh_in_background, name="RedirectResolver", daemon=True).start()
+        return self._redirects
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            self.logger.warning("Could not refresh redirects: %s", e)
+        finally:
+            self._refreshing = False
+
+    def refresh(self):
+        """Downloads the redirect list again. If that fails, the current one is kept (and tried again later)"""
+        xml = self.client.redirects(accept="application/xml")
+        if xml:
+            self.load(xml)
+        else:
+            self._loaded = self._now()
+            if self._redirects is None:
+                self._redirects = {}
+
+    def load(self, xml):
+        """Indexes a redirect list (xml of api.redirectList)"""
+        redirect_list = api.CreateFromDocument(xml)
+        redirects = {entry.from_: entry.to for entry in redirect_list.entry}
+        self._redirects = RedirectResolver.collapse(redirects)
+        self.last_change = redirect_list.lastChange
+        self._loaded = self._now()
+        self.refreshes += 1
+
+    @staticmethod
+    def collapse(redirects: dict) -> dict:
+        """Maps every source in redirects to the end of its chain. Sources in a cycle are left out"""
+        collapsed = {}
+        for source in redirects:
+            target = redirects[source]
+            seen = {source}
+            while target in redirects and target not in seen:
+                seen.add(target)
+                target = redirects[target]
+            if target in seen:
+                RedirectResolver.logger.warning("Redirects of %s are circular", source)
+                continue
+            collapsed[source] = target
+        return collapsed
+
+    def __len__(self):
+        return len(self._redirects or ())
+
+    def __str__(self):
+        return "RedirectResolver(%s redirects, last change %s, %s rewrites, %s refreshes)" % (
+            len(self), self.last_change, self.rewrites, self.refreshes)
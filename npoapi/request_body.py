@@ -0,0 +1,133 @@
+"""
+Request bodies. Besides bytes (and str), bodies may be memoryviews, file objects (opened in binary mode) and iterables of
+bytes. The last two are streams: they are not read in memory, but sent with chunked transfer encoding.
+
+Files can be mapped in memory (map_file), so they are sent directly from the page cache, without being read in.
+
+A stream can only be sent again (after a retry, a fail over or a redirect) if it is seekable. rewind(req) is called
+before sending a request to take care of that.
+"""
+
+import mmap
+import os
+
+CHUNK_SIZE = 64 * 1024
+
+
+def is_stream(data) -> bool:
+    """Whether the body is a file object or an iterable, which is sent with chunked transfer encoding"""
+    if data is None or isinstance(data, (str, bytes, bytearray, memoryview, dict)):
+        return False
+    return hasattr(data, "read") or hasattr(data, "__iter__")
+
+
+def content_length(data) -> int:
+    """The length of the body in bytes, or None if it is a stream"""
+    if data is None:
+        return 0
+    if is_stream(data):
+        return None
+    return memoryview(data).nbytes
+
+
+def chunks(data, size: int = CHUNK_SIZE):
+    """The body as an iterator of bytes"""
+    if not is_stream(data):
+        if data:
+            yield data
+        return
+    if hasattr(data, "read"):
+        while True:
+            chunk = data.read(size)
+            if not chunk:
+                return
+            yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+    for chunk in data:
+        if chunk:
+            yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+
+def map_file(path: str) -> memoryview:
+    """The contents of the file as a read only memoryview on a memory map of it. This can be used as a request body (with
+    a Content-Length) without copying the file in memory. The map is released when the memoryview is garbage collected."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def read_all(data) -> bytes:
+    """The complete body as bytes"""
+    return b"".join(bytes(chunk) for chunk in chunks(data))
+
+
+def sniff_content_type(data) -> str:
+    """json or xml, judging by the first character of the body. Of streams, only seekable file objects can be sniffed
+    (they are seeked back afterwards)"""
+    if is_stream(data):
+        if not hasattr(data, "read") or not _seekable(data):
+            return None
+        stream = data
+        position = stream.tell()
+        try:
+            data = stream.read(64)
+        finally:
+            stream.seek(position)
+    if isinstance(data, str):
+        data = data[:64].encode("utf-8")
+    try:
+        head = bytes(memoryview(data)[:64]).lstrip()
+    except TypeError:
+        # None, streams
+        return None
+    if head.startswith(b"{") or head.startswith(b"["):
+        return "application/json"
+    if head.startswith(b"<"):
+        return "application/xml"
+    return None
+
+
+def rewind(req) -> bool:
+    """Prepares the body of the urllib request to be sent (again). Returns False if that is impossible, because it is
+    a stream that was already (partially) sent and can't be seeked to its start"""
+    data = req.data
+    if not is_stream(data):
+        return True
+    if isinstance(data, _Once):
+        return not data.started
+    if _seekable(data):
+        if not hasattr(req, "body_position"):
+            req.body_position = data.tell()
+        else:
+            data.seek(req.body_position)
+        return True
+    req.data = _Once(data)
+    return True
+
+
+def replayable(req) -> bool:
+    """Whether the body of the request can be sent once more"""
+    data = req.data
+    if isinstance(data, _Once):
+        return not data.started
+    return not is_stream(data) or _seekable(data)
+
+
+def _seekable(data) -> bool:
+    try:
+        return hasattr(data, "seek") and (not hasattr(data, "seekable") or data.seekable())
+    except ValueError:
+        # closed file
+        return False
+
+
+class _Once(object):
+    """Wraps a stream that can be iterated only once, and remembers whether that has started"""
+
+    def __init__(self, data):
+        self.data = data
+        self.started = False
+
+    def __iter__(self):
+        self.started = True
+        return chunks(self.data)
@@ -0,0 +1,68 @@
+import email.utils
+import random
+import time
+import urllib.error
+
+
+class RetryPolicy(object):
+    """
+    Decides whether (and after how long) a failed request is executed again.
+
+    Connection problems and the statuses in retry_statuses are retried at most max_retries times, with exponential
+    backoff (backoff_factor * 2^attempt, at most max_backoff seconds) and full jitter. On 429 and 503 a Retry-After header
+    of the server is honoured instead, unless it asks for more than max_retry_after seconds.
+
+    Only idempotent methods are retried, unless retry_posts is set. Retrying a POST which did reach the server may result
+    in it being processed twice.
+    """
+    __author__ = "Michiel Meeuwissen"
+
+    IDEMPOTENT_METHODS = {"GET", "HEAD", "DELETE"}
+    RETRY_AFTER_STATUSES = {429, 503}
+
+    def __init__(self, max_retries: int = 3, backoff_factor: float = 0.5, max_backoff: float = 30,
+                 retry_statuses=(429, 500, 502, 503, 504), retry_posts: bool = False, max_retry_after: float = 300):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = set(retry_statuses)
+        self.retry_posts = retry_posts
+        self.max_retry_after = max_retry_after
+
+    def is_retryable_method(self, method: str) -> bool:
+        return method in RetryPolicy.IDEMPOTENT_METHODS or self.retry_posts
+
+    def delay(self, method: str, error: urllib.error.URLError, attempt: int) -> float:
+        """The number of seconds to wait before the next attempt, or None if the request should not be retried"""
+        if attempt >= self.max_retries or not self.is_retryable_method(method):
+            return None
+        if isinstance(error, urllib.error.HTTPError):
+            if error.code not in self.retry_statuses:
+                return None
+            if error.code in RetryPolicy.RETRY_AFTER_STATUSES:
+                retry_after = self.retry_after(error.headers)
+                if retry_after is not None:
+                    return retry_after if retry_after <= self.max_retry_after else None
+        return self.backoff(attempt)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+    @staticmethod
+    def retry_after(headers) -> float:
+        """Parses a Retry-After header, which is either a number of seconds or a http date"""
+        value = headers.get("Retry-After") if headers else None
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, date.timestamp() - time.time())
+
+    def __str__(self):
+        return "RetryPolicy(max_retries=%s, backoff_factor=%s, retry_posts=%s)" % (
+            self.max_retries, self.backoff_factor, self.retry_posts)
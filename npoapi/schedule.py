@@ -1,8 +1,37 @@
+import concurrent.futures
+import datetime
+
+from npoapi.cache import LruCache
 from npoapi.npoapi import NpoApi
 
 
 class Schedule(NpoApi):
+    schedule_cache = None
+    # guide days at least this many days ago don't change anymore, and are cached for past_ttl seconds
+    immutable_after = 2
+    past_ttl = float("inf")
+
+    def cached(self, max_size: int = 1000, ttl: float = 60, max_stale: float = 0, past_ttl: float = float("inf"),
+               immutable_after: int = 2):
+        """Caches the results of get in memory, see npoapi.cache.LruCache. max_size 0 disables caching. With max_stale,
+        expired results are returned (at most max_stale seconds) while refreshing them in the background.
+
+        Guide days at least immutable_after days in the past are cached for past_ttl seconds (also in the response cache
+        on disk, see cache_responses), so they survive this process. See also prewarm."""
+        self.schedule_cache = LruCache(max_size, ttl, max_stale=max_stale) if max_size else None
+        self.past_ttl = past_ttl
+        self.immutable_after = immutable_after
+        return self
+
     def get(self, guideDay=None, channel=None,  sort="asc", offset=0, limit=240, properties=None, accept=None):
+        if self.schedule_cache is None:
+            return self._get(guideDay, channel, sort, offset, limit, properties, accept)
+        key = (self.url, channel, str(guideDay), properties, sort, offset, limit, accept or self._accept)
+        return self._get_or_load(self.schedule_cache, key,
+                                 lambda: self._get(guideDay, channel, sort, offset, limit, properties, accept),
+                                 ttl=self.past_ttl if self._immutable(guideDay) else None)
+
+    def _get(self, guideDay=None, channel=None,  sort="asc", offset=0, limit=240, properties=None, accept=None):
         params = {
             'guideDay': guideDay,
             "sort": sort,
@@ -15,7 +44,45 @@ class Schedule(NpoApi):
         else:
             return self.request("/api/schedule", params=params)
 
+    def prewarm(self, start, stop, channels=(None,), properties=None, max_workers: int = 4) -> int:
+        """Gets the schedules of all guide days from start until (excluding) stop (dates or "YYYY-MM-DD" strings), for
+        each of the channels (None is all channels), using max_workers threads. So they are cached (see cached and
+        cache_responses). Returns the number of successfully got schedules"""
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prewarm") as executor:
+            results = executor.map(lambda args: self.get(guideDay=args[0], channel=args[1], properties=properties),
+                                   Schedule._guide_days(start, stop, channels))
+            return sum(1 for result in results if result)
+
+    @staticmethod
+    def _guide_days(start, stop, channels) -> list:
+        """(guideDay, channel) for all days from start until stop, and all channels"""
+        start, stop = Schedule._date(start), Schedule._date(stop)
+        days = [start + datetime.timedelta(days=i) for i in range((stop - start).days)]
+        return [(day.isoformat(), channel) for day in days for channel in channels]
+
     def search(self, form="{}", sort="asc", offset=0, limit=240, profile=None, properties=None, accept=None):
         return self.request("/api/schedule/", data=form, accept=accept, params={
         "profile": profile, "sort": sort, "offset": offset, "max": limit, "properties": properties}
                             )
+
+    def _immutable(self, guideDay) -> bool:
+        """Whether the schedule of guideDay will not change anymore"""
+        if guideDay is None:
+            return False
+        try:
+            return Schedule._date(guideDay) <= datetime.date.today() - datetime.timedelta(days=self.immutable_after)
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _date(day) -> datetime.date:
+        if isinstance(day, datetime.datetime):
+            return day.date()
+        if isinstance(day, datetime.date):
+            return day
+        return datetime.date.fromisoformat(str(day)[:10])
+
+    def _cache_ttl(self, path: str, params) -> float:
+        if params and self._immutable(params.get("guideDay")):
+            return self.past_ttl
+        return super()._cache_ttl(path, params)
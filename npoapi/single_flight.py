@@ -0,0 +1,55 @@
+import threading
+
+
+class SingleFlight(object):
+    """
+    Request coalescing: if a call with a certain key is executed while an other thread is already executing a call with
+    the same key, it does not execute it again, but waits for the result of that one (or its exception).
+    """
+
+    def __init__(self):
+        self.executed = 0
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function) -> (object, bool):
+        """Returns the result of function(), or of the call with the same key in flight, and whether it was shared"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = function()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def __len__(self):
+        """The number of calls in flight"""
+        return len(self._calls)
+
+    def __str__(self):
+        return "SingleFlight(%s executed, %s shared, %s in flight)" % (self.executed, self.shared, len(self))
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
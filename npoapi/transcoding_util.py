@@ -6,6 +6,8 @@ import urllib
 import os
 from fractions import Fraction
 from npoapi import MediaBackendUtil
+from npoapi.connection_pool import ConnectionPool
+from npoapi.transport import Transport
 
 
 class TranscodingUtil(object):
@@ -128,11 +130,14 @@ class TranscodingUtil(object):
         return "%02d:%02d:%02d.%03d" % MediaBackendUtil.parse(offset_in_ms)
 
     @staticmethod
-    def check_exists(programUrl):
+    def check_exists(programUrl, transport: Transport = None):
         request = urllib.request.Request(programUrl, method="HEAD")
+        if transport is None:
+            transport = ConnectionPool.shared()
         try:
-            response = urllib.request.urlopen(request)
-            if response.code == 200:
+            response = transport.urlopen(request)
+            response.read()
+            if response.status == 200:
                 return True
         except urllib.error.HTTPError as ue:
             if ue.code == 404:
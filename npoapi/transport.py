@@ -0,0 +1,178 @@
+import abc
+import http.client
+import io
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from npoapi import request_body
+
+
+class Transport(object):
+    """
+    Executes urllib.request.Request objects. Implementations behave like urllib.request.urlopen: they return a file like
+    response with headers, getcode() and getheaders(), and raise HTTPError for 4xx/5xx responses and URLError if the
+    server could not be reached.
+
+    See UrllibTransport, npoapi.connection_pool.ConnectionPool and WsgiTransport.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def urlopen(self, req: urllib.request.Request, timeout: float = None):
+        pass
+
+    def close(self):
+        pass
+
+
+class UrllibTransport(Transport):
+    """Plain urllib. Every request opens a new connection. Uses the given OpenerDirector, or else an own default one."""
+
+    def __init__(self, opener: urllib.request.OpenerDirector = None):
+        self.opener = opener if opener else urllib.request.build_opener()
+
+    def urlopen(self, req: urllib.request.Request, timeout: float = None):
+        return self.opener.open(req, timeout=timeout)
+
+    def __str__(self):
+        return "UrllibTransport"
+
+
+class WsgiResponse(io.RawIOBase):
+    """The response of a WSGI application, readable like a http.client.HTTPResponse. The body is read lazily."""
+
+    def __init__(self, url: str, status: str, headers: list, body, first_chunk: bytes = b""):
+        super().__init__()
+        code, _, reason = status.partition(" ")
+        self.url = url
+        self.status = self.code = int(code)
+        self.reason = self.msg = reason
+        self.headers = http.client.HTTPMessage()
+        for name, value in headers:
+            self.headers[name] = value
+        self._body = body
+        self._chunks = iter(body)
+        self._pending = first_chunk
+        self._offset = 0
+
+    def getcode(self) -> int:
+        return self.status
+
+    def getheader(self, name: str, default=None):
+        return self.headers.get(name, default)
+
+    def getheaders(self) -> list:
+        return list(self.headers.items())
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        view = memoryview(b).cast("B")
+        count = 0
+        while count < len(view):
+            if self._offset >= len(self._pending):
+                self._pending = next(self._chunks, None)
+                self._offset = 0
+                if self._pending is None:
+                    self._pending = b""
+                    break
+                continue
+            n = min(len(self._pending) - self._offset, len(view) - count)
+            view[count:count + n] = self._pending[self._offset:self._offset + n]
+            self._offset += n
+            count += n
+        return count
+
+    def close(self):
+        if not self.closed and hasattr(self._body, "close"):
+            self._body.close()
+        super().close()
+
+
+class WsgiTransport(Transport):
+    """
+    Dispatches requests in process to a WSGI application, without any socket. Useful to test or benchmark the client
+    without a server: e.g. client.transport(WsgiTransport(app)), where app(environ, start_response) imitates the api.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.requests = 0
+
+    def environ(self, req: urllib.request.Request) -> dict:
+        url = urllib.parse.urlsplit(req.full_url)
+        body = request_body.read_all(req.data)
+        environ = {
+            "REQUEST_METHOD": req.get_method(),
+            "SCRIPT_NAME": "",
+            "PATH_INFO": urllib.parse.unquote_to_bytes(url.path).decode("latin-1"),
+            "QUERY_STRING": url.query,
+            "SERVER_NAME": url.hostname or "localhost",
+            "SERVER_PORT": str(url.port or (443 if url.scheme == "https" else 80)),
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": url.scheme,
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False
+        }
+        for name, value in req.header_items():
+            key = name.upper().replace("-", "_")
+            if key == "CONTENT_TYPE":
+                environ[key] = value
+            elif key != "CONTENT_LENGTH":
+                environ["HTTP_" + key] = value
+        environ.setdefault("HTTP_HOST", url.netloc)
+        return environ
+
+    def urlopen(self, req: urllib.request.Request, timeout: float = None):
+        self.requests += 1
+        started = []
+        written = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            started[:] = [status, headers]
+            return write
+
+        def write(data):
+            # (legacy) imperative output, which precedes the returned iterable
+            written.append(bytes(data))
+
+        body = self.app(self.environ(req), start_response)
+        first_chunk = b""
+        if not started:
+            # start_response may be called on the first iteration
+            chunks = iter(body)
+            first_chunk = next(chunks, b"")
+            body = _Remaining(body, chunks)
+        first_chunk = b"".join(written) + first_chunk
+        response = WsgiResponse(req.full_url, started[0], started[1], body, first_chunk)
+        if response.status >= 400:
+            raise urllib.error.HTTPError(req.full_url, response.status, response.reason, response.headers, response)
+        return response
+
+    def __str__(self):
+        return "WsgiTransport(%s, %s requests)" % (self.app, self.requests)
+
+
+class _Remaining(object):
+    """The rest of an already started WSGI body iterable, which still has to be closed"""
+
+    def __init__(self, body, chunks):
+        self.body = body
+        self.chunks = chunks
+
+    def __iter__(self):
+        return self.chunks
+
+    def close(self):
+        if hasattr(self.body, "close"):
+            self.body.close()
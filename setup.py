@@ -8,9 +8,10 @@ setup(
     name='NPO API',
     version=__version__,
     packages=['npoapi', 'npoapi.xml'],
+    python_requires='>=3.7',
     install_requires=[
         'pytz>=2017.3',
-        'ijson>=2.3',
+        'ijson>=3.1',
         'pyxb==1.2.6',
         #'jwt==0.5.2',
         'python-dateutil>=2.6.1'
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import asyncio
+import unittest
+import urllib.parse
+
+from npoapi import AsyncMediaBackend
+from npoapi.async_transport import AsyncWsgiTransport
+
+
+def app(environ, start_response):
+    path = environ["PATH_INFO"]
+    if environ["REQUEST_METHOD"] == "POST" and path == "/media/media/":
+        query = urllib.parse.parse_qs(environ["QUERY_STRING"])
+        body = environ["wsgi.input"].read(int(environ["CONTENT_LENGTH"]))
+        if b"FAIL" in body:
+            start_response("400 Bad Request", [("Content-Type", "text/plain")])
+            return [b"invalid"]
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [("%s %s %s" % (body.decode("utf-8"), query["errors"][0], query["validateInput"][0])).encode("utf-8")]
+    if environ["REQUEST_METHOD"] == "DELETE":
+        start_response("202 Accepted", [("Content-Type", "text/plain")])
+        return [path.encode("utf-8")]
+    if path == "/media/media/POMS_VPRO_123":
+        start_response("200 OK", [("Content-Type", "application/xml")])
+        return [b"<program mid='POMS_VPRO_123'/>"]
+    start_response("404 Not Found", [("Content-Type", "text/plain")])
+    return [b"not found"]
+
+
+class SlowTransport(AsyncWsgiTransport):
+    """Keeps track of the number of concurrent requests"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def urlopen(self, req, timeout=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return await super().urlopen(req, timeout)
+        finally:
+            self.in_flight -= 1
+
+
+class Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = SlowTransport(app)
+        self.client = AsyncMediaBackend(email="errors@vpro.nl", max_in_flight=3).async_transport(self.transport)
+        self.client.url = "http://localhost/"
+        self.client.settings["user"] = "user:password"
+
+    def test_post(self):
+        async def run():
+            futures = [self.client.post("<program mid='M%d'/>" % i, raw=True) for i in range(20)]
+            self.assertEqual(20, self.client.pending())
+            return await asyncio.gather(*futures)
+        results = asyncio.run(run())
+        self.assertEqual(["<program mid='M%d'/> errors@vpro.nl false" % i for i in range(20)], results)
+        self.assertEqual(3, self.transport.max_in_flight)
+        self.assertEqual(0, self.client.pending())
+
+    def test_failure(self):
+        async def run():
+            return await self.client.post("<program mid='FAIL'/>", raw=True)
+        self.assertIsNone(asyncio.run(run()))
+        self.assertEqual(400, self.client.code)
+
+    def test_delete_and_join(self):
+        async def run():
+            futures = [self.client.delete("M%d" % i) for i in range(5)]
+            await self.client.join()
+            return [f.result() for f in futures]
+        self.assertEqual(["/media/media/M%d" % i for i in range(5)], asyncio.run(run()))
+
+    def test_get_is_synchronous(self):
+        self.client.transport(self.transport.transport)
+        self.assertEqual("<program mid='POMS_VPRO_123'/>", self.client.get("POMS_VPRO_123"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+import asyncio
+import gzip
+import http.server
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from npoapi import AsyncMedia, AsyncPages, AsyncSchedule
+from npoapi.async_transport import AsyncConnectionPool, AsyncWsgiTransport
+from npoapi.retry import RetryPolicy
+
+
+def app(environ, start_response):
+    path = environ["PATH_INFO"]
+    if path == "/v1/api/media/changes":
+        start_response("200 OK", [("Content-Type", "application/json")])
+        return [b'{"changes": [', b",".join(json.dumps({"mid": "M%d" % i}).encode("utf-8") for i in range(50)), b']}']
+    if path == "/v1/api/pages/iterate":
+        start_response("200 OK", [("Content-Type", "application/json")])
+        return [b'{"pages": [{"url": "http://www.vpro.nl/1"}, {"url": "http://www.vpro.nl/2"}]}']
+    if path == "/v1/api/media/multiple":
+        ids = urllib.parse.parse_qs(environ["QUERY_STRING"])["ids"][0].split(",")
+        start_response("200 OK", [("Content-Type", "application/json")])
+        return [json.dumps({"items": [{"id": mid, "result": {"mid": mid}} for mid in ids]}).encode("utf-8")]
+    if path.startswith("/v1/api/media/WO_"):
+        start_response("200 OK", [("Content-Type", "application/json")])
+        return [json.dumps({"mid": path[len("/v1/api/media/"):], "authorization": environ.get("HTTP_AUTHORIZATION")}).encode("utf-8")]
+    if path == "/v1/api/schedule/channel/NED1":
+        start_response("503 Service Unavailable", [("Content-Type", "text/plain")])
+        return [b"busy"]
+    start_response("404 Not Found", [("Content-Type", "text/plain")])
+    return [b"not found"]
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path == "/moved":
+            self.send_response(302)
+            self.send_header("Location", "/media")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/chunked":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in (b"hello ", b"chunked ", b"world"):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+            return
+        body = ("hello " + self.path).encode("utf-8")
+        if self.path == "/gzipped":
+            body = gzip.compress(body)
+        self.send_response(404 if self.path == "/missing" else 200)
+        self.send_header("Content-Type", "text/plain")
+        if self.path == "/gzipped":
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PoolTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:%d" % cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_reuse(self):
+        async def run():
+            pool = AsyncConnectionPool()
+            bodies = []
+            for path in ("/a", "/chunked", "/b"):
+                response = await pool.urlopen(urllib.request.Request(self.url + path))
+                bodies.append(await response.read())
+            await pool.close()
+            return pool, bodies
+        pool, bodies = asyncio.run(run())
+        self.assertEqual([b"hello /a", b"hello chunked world", b"hello /b"], bodies)
+        self.assertEqual(1, pool.created)
+        self.assertEqual(2, pool.reused)
+
+    def test_max_per_host(self):
+        async def run():
+            pool = AsyncConnectionPool(max_per_host=2)
+            async def get(i):
+                async with await pool.urlopen(urllib.request.Request(self.url + "/%d" % i)) as response:
+                    return await response.read()
+            bodies = await asyncio.gather(*[get(i) for i in range(10)])
+            await pool.close()
+            return pool, bodies
+        pool, bodies = asyncio.run(run())
+        self.assertEqual(["hello /%d" % i for i in range(10)], [b.decode("utf-8") for b in bodies])
+        self.assertEqual(2, pool.created)
+
+    def test_all_in_use(self):
+        async def run():
+            pool = AsyncConnectionPool(max_per_host=1)
+            response = await pool.urlopen(urllib.request.Request(self.url + "/a"))
+            with self.assertRaises(urllib.error.URLError):
+                await pool.urlopen(urllib.request.Request(self.url + "/b"), timeout=0.1)
+            await response.read()
+            body = await (await pool.urlopen(urllib.request.Request(self.url + "/b"))).read()
+            await pool.close()
+            return body
+        self.assertEqual(b"hello /b", asyncio.run(run()))
+
+    def test_http_error(self):
+        async def run():
+            await AsyncConnectionPool().urlopen(urllib.request.Request(self.url + "/missing"))
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            asyncio.run(run())
+        self.assertEqual(404, context.exception.code)
+        self.assertEqual(b"hello /missing", context.exception.read())
+
+    def test_redirect(self):
+        async def run():
+            response = await AsyncConnectionPool().urlopen(urllib.request.Request(self.url + "/moved"))
+            return response.url, await response.read()
+        self.assertEqual((self.url + "/media", b"hello /media"), asyncio.run(run()))
+
+    def test_connection_refused(self):
+        async def run():
+            await AsyncConnectionPool().urlopen(urllib.request.Request("http://127.0.0.1:1/"))
+        with self.assertRaises(urllib.error.URLError):
+            asyncio.run(run())
+
+    def test_decompress(self):
+        async def run():
+            client = AsyncMedia(key="a", secret="b", origin="http://www.vpro.nl").compressed()
+            client.url = self.url + "/"
+            return await client.request("gzipped")
+        self.assertEqual("hello /gzipped", asyncio.run(run()))
+
+
+class Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = AsyncWsgiTransport(app)
+
+    def client(self, client_class):
+        return client_class(key="a", secret="b", origin="http://www.vpro.nl").async_transport(self.transport)
+
+    def test_get_concurrently(self):
+        client = self.client(AsyncMedia)
+
+        async def run():
+            return await asyncio.gather(*[client.get("WO_VPRO_%d" % i) for i in range(20)])
+        results = [json.loads(r) for r in asyncio.run(run())]
+        self.assertEqual(["WO_VPRO_%d" % i for i in range(20)], [r["mid"] for r in results])
+        self.assertTrue(results[0]["authorization"].startswith("NPO a:"))
+        self.assertEqual(20, self.transport.requests)
+
+    def test_cached(self):
+        client = self.client(AsyncMedia).cached()
+
+        async def run():
+            first = await client.get("WO_VPRO_1")
+            return first, await client.get("WO_VPRO_1"), json.loads(await client.multiple("WO_VPRO_1,WO_VPRO_2"))
+        first, second, multiple = asyncio.run(run())
+        self.assertEqual(first, second)
+        self.assertEqual(1, client.media_cache.hits)
+        self.assertEqual(["WO_VPRO_1", "WO_VPRO_2"], [item["id"] for item in multiple["items"]])
+        self.assertEqual(2, self.transport.requests)
+
+    def test_unsupported(self):
+        client = self.client(AsyncMedia)
+        for configure in (lambda: client.failover(["http://a/v1/", "http://b/v1/"]),
+                          lambda: client.hedged(["http://a/v1/", "http://b/v1/"]),
+                          lambda: client.coalesce(), lambda: client.cache_responses()):
+            with self.assertRaises(TypeError):
+                configure()
+        self.assertIsNone(client.coalesce(False).cache_responses(None).single_flight)
+
+    def test_not_found(self):
+        client = self.client(AsyncMedia)
+        self.assertEqual("", asyncio.run(client.get("POMS_404")))
+        self.assertEqual(404, client.code)
+
+    def test_changes(self):
+        client = self.client(AsyncMedia)
+
+        async def run():
+            return [change["mid"] async for change in client.changes(profile="vpro", stream=True)]
+        self.assertEqual(["M%d" % i for i in range(50)], asyncio.run(run()))
+
+    def test_pages_iterate(self):
+        client = self.client(AsyncPages)
+
+        async def run():
+            return [page["url"] async for page in client.iterate()]
+        self.assertEqual(["http://www.vpro.nl/1", "http://www.vpro.nl/2"], asyncio.run(run()))
+
+    def test_retries(self):
+        client = self.client(AsyncSchedule).retries(RetryPolicy(max_retries=2, backoff_factor=0))
+        self.assertEqual("", asyncio.run(client.get(channel="NED1")))
+        self.assertEqual(503, client.code)
+        self.assertEqual(3, client.metrics["requests"])
+        self.assertEqual(2, client.metrics["retries"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+import asyncio
+import unittest
+
+from npoapi import AsyncMediaBackend, MediaBackend
+from npoapi.async_transport import AsyncWsgiTransport
+from npoapi.transport import WsgiTransport
+
+LOCATIONS = b"""<collection><location xmlns="urn:vpro:media:update:2009" urn="urn:vpro:media:location:1">
+<programUrl>http://www.vpro.nl/1.mp4</programUrl><avAttributes><avFileFormat>MP4</avFileFormat></avAttributes>
+</location></collection>"""
+
+
+class App(object):
+    def __init__(self):
+        self.requests = []
+        self.exists = set()
+
+    def __call__(self, environ, start_response):
+        method, path = environ["REQUEST_METHOD"], environ["PATH_INFO"]
+        self.requests.append((method, path))
+        if method == "POST":
+            environ["wsgi.input"].read()
+            if path == "/media/media/":
+                self.exists.add("POMS_VPRO_2")
+                start_response("200 OK", [("Content-Type", "text/plain")])
+                return [b"POMS_VPRO_2"]
+        if method == "GET" and path.startswith("/media/media/POMS_VPRO_2") and "POMS_VPRO_2" not in self.exists:
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b"not found"]
+        start_response("200 OK", [("Content-Type", "application/xml")])
+        if path.endswith("/locations"):
+            return [LOCATIONS]
+        return [("<program mid='%s' n='%d'/>" % (path.split("/")[3], len(self.requests))).encode("utf-8")]
+
+
+class Tests(unittest.TestCase):
+
+    def client(self):
+        self.app = App()
+        client = MediaBackend().transport(WsgiTransport(self.app)).cached()
+        client.url = "http://localhost/"
+        client.settings["user"] = "user:password"
+        return client
+
+    def gets(self):
+        return len([r for r in self.app.requests if r[0] == "GET"])
+
+    def test_reads(self):
+        client = self.client()
+        first = client.get("POMS_VPRO_1")
+        self.assertEqual(first, client.get("POMS_VPRO_1"))
+        client.get_full("POMS_VPRO_1")
+        client.get_full("POMS_VPRO_1")
+        client.get_images("POMS_VPRO_1")
+        client.get_images("POMS_VPRO_1")
+        self.assertEqual(3, self.gets())
+
+    def test_set_location(self):
+        client = self.client()
+        client.get_locations("POMS_VPRO_1")
+        client.get("POMS_VPRO_1")
+        self.assertEqual(2, self.gets())
+        client.set_location("POMS_VPRO_1", "http://www.vpro.nl/1.mp4", publishStop="2030-01-01T00:00:00Z")
+        self.assertEqual(2, self.gets())
+        client.get_locations("POMS_VPRO_1")
+        client.get("POMS_VPRO_1")
+        self.assertEqual(4, self.gets())
+
+    def test_members(self):
+        client = self.client()
+        client.get("POMS_VPRO_1")
+        client.get("POMS_S_VPRO_1")
+        client.add_member("POMS_VPRO_1", "POMS_S_VPRO_1")
+        client.get("POMS_VPRO_1")
+        client.get("POMS_S_VPRO_1")
+        client.delete_member("POMS_VPRO_1", "POMS_S_VPRO_1")
+        client.get("POMS_S_VPRO_1")
+        self.assertEqual(5, self.gets())
+
+    def test_post_invalidates_not_found(self):
+        client = self.client().cache_not_found()
+        self.assertIsNone(client.get("POMS_VPRO_2", ignore_not_found=True))
+        self.assertIsNone(client.get("POMS_VPRO_2", ignore_not_found=True))
+        self.assertEqual(1, self.gets())
+        self.assertEqual("POMS_VPRO_2", client.post("<program xmlns='urn:vpro:media:update:2009'/>", raw=True))
+        self.assertIsNotNone(client.get("POMS_VPRO_2", ignore_not_found=True))
+        self.assertEqual(2, self.gets())
+
+    def test_async(self):
+        self.app = App()
+        transport = AsyncWsgiTransport(self.app)
+        client = AsyncMediaBackend().async_transport(transport).transport(transport.transport).cached().cache_not_found()
+        client.url = "http://localhost/"
+        client.settings["user"] = "user:password"
+
+        async def run():
+            self.assertIsNone(client.get("POMS_VPRO_2", ignore_not_found=True))
+            first = client.get("POMS_VPRO_1")
+            post = client.post("<program xmlns='urn:vpro:media:update:2009'/>", raw=True)
+            delete = client.delete("POMS_VPRO_1")
+            # while the writes are in flight, the old documents are still returned, but not kept after
+            self.assertIsNone(client.get("POMS_VPRO_2", ignore_not_found=True))
+            self.assertEqual(first, client.get("POMS_VPRO_1"))
+            self.assertEqual("POMS_VPRO_2", await post)
+            await delete
+            await asyncio.sleep(0)
+            self.assertIsNotNone(client.get("POMS_VPRO_2", ignore_not_found=True))
+            self.assertNotEqual(first, client.get("POMS_VPRO_1"))
+        asyncio.run(run())
+        self.assertEqual(4, self.gets())
+
+
+if __name__ == '__main__':
+    unittest.main()
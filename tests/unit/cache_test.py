@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import threading
+import time
+import unittest
+import urllib.parse
+
+from npoapi import Media, MediaBackend, Schedule
+from npoapi.cache import LruCache
+from npoapi.transport import WsgiTransport
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+requested = []
+
+
+def app(environ, start_response):
+    path = environ["PATH_INFO"]
+    if "POMS_404" in path:
+        start_response("404 Not Found", [("Content-Type", "application/json")])
+        return [b'{"status": 404}']
+    start_response("200 OK", [("Content-Type", "application/json")])
+    if path == "/v1/api/media/multiple":
+        ids = urllib.parse.parse_qs(environ["QUERY_STRING"])["ids"][0].split(",")
+        requested.append(ids)
+        return [json.dumps({"items": [{"id": mid, "result": {"mid": mid}} if mid.startswith("WO_")
+                                      else {"id": mid, "error": {"status": 404}} for mid in ids]}).encode("utf-8")]
+    return [json.dumps({"mid": path.split("/")[-1], "query": environ["QUERY_STRING"]}).encode("utf-8")]
+
+
+class Tests(unittest.TestCase):
+
+    def test_lru(self):
+        cache = LruCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(1, cache.get("a"))
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(1, cache.get("a"))
+        self.assertEqual(3, cache.get("c"))
+        self.assertEqual(1, cache.evictions)
+        self.assertEqual((3, 1), (cache.hits, cache.misses))
+        self.assertEqual(0.75, cache.hit_rate())
+
+    def test_ttl(self):
+        cache = LruCache(ttl=10)
+        cache._now = Clock()
+        cache.put("a", 1)
+        cache.put("b", 2, ttl=float("inf"))
+        cache._now.now += 10
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(2, cache.get("b"))
+        self.assertEqual(1, cache.expirations)
+        self.assertEqual(1, len(cache))
+
+    def test_tags(self):
+        cache = LruCache(max_size=3)
+        cache.put("a", 1, tags=("WO_1",))
+        cache.put("b", 2, tags=("WO_1", "WO_2"))
+        cache.put("c", 3, tags=("WO_2",))
+        self.assertEqual(2, cache.invalidate_tag("WO_1"))
+        self.assertEqual(0, cache.invalidate_tag("WO_1"))
+        self.assertEqual(3, cache.get("c"))
+        cache.put("d", 4)
+        cache.put("e", 5)
+        cache.put("f", 6)
+        self.assertEqual(0, cache.invalidate_tag("WO_2"))
+        self.assertEqual({}, cache._tags)
+
+    def test_stale_while_revalidate(self):
+        cache = LruCache(ttl=10, max_stale=20)
+        cache._now = Clock()
+        loads = []
+        release = threading.Event()
+
+        def load():
+            loads.append(len(loads))
+            if len(loads) > 1:
+                release.wait(5)
+            return "v%d" % len(loads)
+        self.assertEqual("v1", cache.get_or_load("a", load))
+        cache._now.now += 15
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual("v1", cache.get_or_load("a", load))
+        self.assertEqual("v1", cache.get_or_load("a", load))
+        release.set()
+        for i in range(500):
+            if cache.refreshes:
+                break
+            time.sleep(0.01)
+        self.assertEqual("v2", cache.get_or_load("a", load))
+        self.assertEqual((2, 2, 1), (len(loads), cache.stale_hits, cache.refreshes))
+        cache._now.now += 31
+        self.assertEqual("v3", cache.get_or_load("a", load))
+        self.assertEqual(1, cache.expirations)
+
+    def test_stale_while_revalidate_async(self):
+        cache = LruCache(ttl=10, max_stale=20)
+        cache._now = Clock()
+        loads = []
+
+        async def load():
+            loads.append(len(loads))
+            return "v%d" % len(loads)
+
+        async def run():
+            first = await cache.get_or_load_async("a", load)
+            cache._now.now += 15
+            stale = await cache.get_or_load_async("a", load)
+            await asyncio.gather(*cache._refresh_tasks)
+            return first, stale, await cache.get_or_load_async("a", load)
+        self.assertEqual(("v1", "v1", "v2"), asyncio.run(run()))
+        self.assertEqual((2, 1), (len(loads), cache.refreshes))
+
+    def test_invalidated_while_loading(self):
+        cache = LruCache(ttl=10, max_stale=20)
+        cache._now = Clock()
+
+        def load():
+            cache.invalidate_tag("WO_1")
+            return "old"
+        self.assertEqual("old", cache.get_or_load("a", load, tags=("WO_1",)))
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", "v1", tags=("WO_1",))
+        cache._now.now += 15
+        self.assertEqual("v1", cache.get_or_load("a", load, tags=("WO_1",)))
+        for i in range(500):
+            if "a" not in cache._refreshing:
+                break
+            time.sleep(0.01)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(0, cache.refreshes)
+        generation = cache.generation()
+        cache.clear()
+        self.assertFalse(cache.put("a", "old", generation=generation))
+        self.assertTrue(cache.put("a", "new", generation=cache.generation()))
+
+    def test_schedule_get(self):
+        transport = WsgiTransport(app)
+        client = Schedule(key="a", secret="b", origin="http://www.vpro.nl").transport(transport).cached()
+        self.assertEqual(client.get(channel="NED1", guideDay="2020-01-01"), client.get(channel="NED1", guideDay="2020-01-01"))
+        client.get(channel="NED1", guideDay="2020-01-02")
+        self.assertEqual(2, transport.requests)
+
+    def test_media_get(self):
+        transport = WsgiTransport(app)
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(transport).cached(max_size=100)
+        first = client.get("WO_VPRO_1", properties="title")
+        self.assertEqual(first, client.get("WO_VPRO_1", properties="title"))
+        self.assertEqual(1, transport.requests)
+        client.get("WO_VPRO_1", properties="description")
+        self.assertEqual(2, transport.requests)
+        self.assertEqual(1, client.media_cache.hits)
+
+    def test_media_multiple(self):
+        transport = WsgiTransport(app)
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(transport).cached()
+        client.multiple("WO_1,WO_2")
+        result = json.loads(client.multiple("WO_2,WO_3,POMS_404"))
+        self.assertEqual(["WO_2", "WO_3", "POMS_404"], [item["id"] for item in result["items"]])
+        self.assertEqual(["WO_3", "POMS_404"], requested[-1])
+        result = json.loads(client.multiple("WO_1,WO_2,WO_3"))
+        self.assertEqual(["WO_1", "WO_2", "WO_3"], [item["result"]["mid"] for item in result["items"]])
+        self.assertEqual(2, transport.requests)
+
+    def test_not_found(self):
+        transport = WsgiTransport(app)
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(transport).cache_not_found(ttl=10)
+        client.not_found_cache._now = Clock()
+        self.assertEqual("", client.get("POMS_404"))
+        self.assertEqual("", client.get("POMS_404"))
+        self.assertEqual(404, client.code)
+        self.assertEqual(1, transport.requests)
+        self.assertEqual(1, client.metrics["not_found_cached"])
+        client.get("WO_1")
+        client.get("WO_1")
+        self.assertEqual(3, transport.requests)
+        client.not_found_cache._now.now += 10
+        client.get("POMS_404")
+        self.assertEqual(4, transport.requests)
+
+    def test_invalidate_not_found(self):
+        transport = WsgiTransport(app)
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(transport).cache_not_found()
+        client.get("POMS_404")
+        client.get("POMS_404", properties="title")
+        client.get("POMS_404")
+        self.assertEqual(2, transport.requests)
+        self.assertEqual(2, client.invalidate("POMS_404"))
+        client.get("POMS_404")
+        self.assertEqual(3, transport.requests)
+
+    def test_backend_not_found(self):
+        transport = WsgiTransport(app)
+        client = MediaBackend().transport(transport).cache_not_found()
+        client.url = "http://localhost/"
+        client.settings["user"] = "user:password"
+        for i in range(3):
+            self.assertIsNone(client.get("POMS_404", ignore_not_found=True))
+        self.assertEqual(1, transport.requests)
+        self.assertEqual(404, client.code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import gzip
+import http.server
+import io
+import threading
+import unittest
+import zlib
+
+import ijson
+
+from npoapi import Media
+from npoapi import compression
+
+
+class Response(io.BytesIO):
+    def __init__(self, body, encoding):
+        super().__init__(body)
+        self.headers = {"Content-Encoding": encoding}
+
+    def getcode(self):
+        return 200
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    accept_gzip = True
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        encoding = self.headers.get("Content-Encoding")
+        Handler.received.append((encoding, len(body)))
+        if encoding == "gzip":
+            if not Handler.accept_gzip:
+                self.respond(415, b"Unsupported Media Type")
+                return
+            body = gzip.decompress(body)
+        if b"invalid" in body:
+            self.respond(400, b"Bad Request")
+            return
+        self.respond(200, body)
+
+    def respond(self, code, body):
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Tests(unittest.TestCase):
+    JSON = ('{"total": 1000, "items": [' + ",".join('{"mid": "WO_VPRO_%d"}' % i for i in range(1000)) + ']}').encode("utf-8")
+
+    def test_gzip(self):
+        response = compression.decompressing(Response(gzip.compress(self.JSON), "gzip"))
+        self.assertIsInstance(response, compression.DecompressingResponse)
+        self.assertEqual(200, response.getcode())
+        self.assertEqual(self.JSON, response.read())
+
+    def test_deflate(self):
+        self.assertEqual(self.JSON, compression.decompressing(Response(zlib.compress(self.JSON), "deflate")).read())
+        raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        raw_deflate = raw.compress(self.JSON) + raw.flush()
+        self.assertEqual(self.JSON, compression.decompressing(Response(raw_deflate, "deflate")).read())
+
+    def test_concatenated_members(self):
+        body = gzip.compress(self.JSON[:100]) + gzip.compress(self.JSON[100:])
+        self.assertEqual(self.JSON, compression.decompressing(Response(body, "gzip")).read())
+
+    def test_readinto(self):
+        response = compression.decompressing(Response(gzip.compress(self.JSON), "gzip"))
+        buffer = bytearray(1000)
+        result = bytearray()
+        while True:
+            count = response.readinto(buffer)
+            result += buffer[0:count]
+            if count < len(buffer):
+                break
+        self.assertEqual(self.JSON, bytes(result))
+
+    def test_ijson(self):
+        response = compression.decompressing(Response(gzip.compress(self.JSON), "gzip"))
+        mids = [item["mid"] for item in ijson.items(response, "items.item")]
+        self.assertEqual(1000, len(mids))
+        self.assertEqual("WO_VPRO_999", mids[-1])
+
+    def test_not_compressed(self):
+        response = Response(self.JSON, "identity")
+        self.assertIs(response, compression.decompressing(response))
+        self.assertEqual(b"error", compression.decode_body({}, b"error"))
+        self.assertEqual(b"error", compression.decode_body({"Content-Encoding": "gzip"}, gzip.compress(b"error")))
+
+
+class RequestTests(unittest.TestCase):
+    FORM = '{"searches": {"text": "' + "a" * 20000 + '"}}'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:%d/v1" % cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.received = []
+        self.client = Media(key="a", secret="b", origin="http://www.vpro.nl", env=self.url).compressed_requests(1024)
+
+    def test_compressed(self):
+        Handler.accept_gzip = True
+        self.assertEqual(self.FORM, self.client.search(form=self.FORM))
+        self.assertEqual("gzip", Handler.received[0][0])
+        self.assertLess(Handler.received[0][1], 1024)
+
+    def test_below_threshold(self):
+        Handler.accept_gzip = True
+        self.client.search(form="{}")
+        self.assertEqual([(None, 2)], Handler.received)
+
+    def test_fallback(self):
+        Handler.accept_gzip = False
+        self.assertEqual(self.FORM, self.client.search(form=self.FORM))
+        self.assertEqual(["gzip", None], [r[0] for r in Handler.received])
+        self.client.search(form=self.FORM)
+        self.assertEqual(["gzip", None, None], [r[0] for r in Handler.received])
+
+    def test_bad_request(self):
+        Handler.accept_gzip = True
+        self.assertEqual("", self.client.search(form=self.FORM.replace("aaaa", "invalid", 1)))
+        self.assertEqual(400, self.client.code)
+        self.client.search(form=self.FORM)
+        self.assertEqual(["gzip", "gzip"], [r[0] for r in Handler.received])
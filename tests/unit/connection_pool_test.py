@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+import http.server
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from npoapi.connection_pool import ConnectionPool
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path == "/moved":
+            self.send_response(302)
+            self.send_header("Location", "/media")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = ("hello " + self.path).encode("utf-8")
+        self.send_response(404 if self.path == "/missing" else 200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Tests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:%d" % cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_reuse(self):
+        pool = ConnectionPool(max_per_host=2)
+        for i in range(5):
+            response = pool.urlopen(urllib.request.Request(self.url + "/media"))
+            self.assertEqual(200, response.getcode())
+            self.assertEqual(b"hello /media", response.read())
+        self.assertEqual(1, pool.created)
+        self.assertEqual(4, pool.reused)
+        pool.close()
+
+    def test_not_read_completely(self):
+        pool = ConnectionPool()
+        response = pool.urlopen(urllib.request.Request(self.url + "/media"))
+        response.read(2)
+        response.close()
+        self.assertEqual(b"hello /media", pool.urlopen(urllib.request.Request(self.url + "/media")).read())
+        self.assertEqual(2, pool.created)
+
+    def test_all_in_use(self):
+        pool = ConnectionPool(max_per_host=2, wait_timeout=0.1)
+        responses = [pool.urlopen(urllib.request.Request(self.url + "/media")) for i in range(2)]
+        with self.assertRaises(urllib.error.URLError):
+            pool.urlopen(urllib.request.Request(self.url + "/media"))
+        with self.assertRaises(urllib.error.URLError):
+            pool.urlopen(urllib.request.Request(self.url + "/media"), timeout=0.1)
+        responses[0].read()
+        self.assertEqual(b"hello /media", pool.urlopen(urllib.request.Request(self.url + "/media")).read())
+        pool.close()
+
+    def test_idle_timeout(self):
+        pool = ConnectionPool(idle_timeout=0)
+        pool.urlopen(urllib.request.Request(self.url + "/media")).read()
+        pool.urlopen(urllib.request.Request(self.url + "/media")).read()
+        self.assertEqual(2, pool.created)
+        self.assertEqual(0, pool.reused)
+
+    def test_http_error(self):
+        pool = ConnectionPool()
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            pool.urlopen(urllib.request.Request(self.url + "/missing"))
+        self.assertEqual(404, e.exception.code)
+        e.exception.read()
+        self.assertEqual(b"hello /media", pool.urlopen(urllib.request.Request(self.url + "/media")).read())
+        self.assertEqual(1, pool.created)
+
+    def test_redirect(self):
+        pool = ConnectionPool()
+        response = pool.urlopen(urllib.request.Request(self.url + "/moved"))
+        self.assertEqual(b"hello /media", response.read())
+        self.assertEqual(1, pool.created)
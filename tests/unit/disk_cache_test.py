@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from npoapi import Media, Schedule
+from npoapi.disk_cache import DiskCache
+from npoapi.transport import WsgiTransport
+
+
+def app(environ, start_response):
+    path = environ["PATH_INFO"]
+    if path.endswith("POMS_404"):
+        start_response("404 Not Found", [("Content-Type", "application/json")])
+        return [b'{"status": 404}']
+    if path.endswith("WO_ETAG"):
+        if environ.get("HTTP_IF_NONE_MATCH") == '"1"':
+            start_response("304 Not Modified", [("ETag", '"1"')])
+            return [b""]
+        start_response("200 OK", [("Content-Type", "application/json"), ("ETag", '"1"')])
+        return [b'{"mid": "WO_ETAG", "title": "' + b"x" * 1000 + b'"}']
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [json.dumps({"path": path, "query": environ["QUERY_STRING"],
+                        "authorization": environ.get("HTTP_AUTHORIZATION", "").split(":")[0]}).encode("utf-8")]
+
+
+def put_many(path, start):
+    cache = DiskCache(path)
+    for i in range(start, start + 50):
+        cache.put("key%d" % i, b"x" * 100, 60)
+
+
+class Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_put(self):
+        cache = DiskCache(self.directory.name)
+        self.assertEqual(os.path.join(self.directory.name, "npoapi-cache.sqlite"), cache.path)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", b"value", 60)
+        cache.put("b", b"expired", -1)
+        cache.put("c", b"not cached", 0)
+        self.assertEqual(b"value", cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNone(cache.get("c"))
+        self.assertEqual(b"value", DiskCache(self.directory.name).get("a"))
+        self.assertEqual((1, 3), (cache.hits, cache.misses))
+
+    def test_ttls(self):
+        cache = DiskCache(self.directory.name)
+        self.assertEqual(0, cache.ttl("/api/media/changes"))
+        self.assertEqual(60, cache.ttl("/api/schedule/channel/NED1"))
+        self.assertEqual(300, cache.ttl("/api/media/WO_VPRO_123"))
+
+    def test_lru_eviction(self):
+        cache = DiskCache(self.directory.name, max_bytes=1000)
+        for key in "abcdefghij":
+            cache.put(key, b"x" * 100, 60)
+        cache.get("a")
+        cache.put("k", b"x" * 100, 60)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(10, len(cache))
+        self.assertEqual(1, cache.evictions)
+
+    def test_processes(self):
+        path = os.path.join(self.directory.name, "cache.sqlite")
+        DiskCache(path).clear()
+        processes = [multiprocessing.Process(target=put_many, args=(path, i * 50)) for i in range(4)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        self.assertEqual([0] * 4, [p.exitcode for p in processes])
+        self.assertEqual(200, len(DiskCache(path)))
+
+    def test_request(self):
+        transport = WsgiTransport(app)
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(transport)\
+            .cache_responses(self.directory.name)
+        first = client.get("WO_VPRO_1", properties="title")
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(transport)\
+            .cache_responses(self.directory.name)
+        self.assertEqual(first, client.get("WO_VPRO_1", properties="title"))
+        self.assertEqual(200, client.code)
+        self.assertEqual(1, transport.requests)
+        client.get("POMS_404")
+        client.get("POMS_404")
+        self.assertEqual(3, transport.requests)
+
+    def test_configured_keys(self):
+        transport = WsgiTransport(app)
+        results = []
+        for key in ("keyA", "keyB"):
+            client = Media().transport(transport).cache_responses(self.directory.name)
+            client.settings.update({"apiKey": key, "secret": "secret", "origin": "http://www.vpro.nl"})
+            results.append(json.loads(client.get("WO_VPRO_1"))["authorization"])
+        self.assertEqual(["NPO keyA", "NPO keyB"], results)
+        self.assertEqual(2, transport.requests)
+
+    def test_revalidate(self):
+        transport = WsgiTransport(app)
+        cache = DiskCache(self.directory.name, default_ttl=-1)
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(transport).cache_responses(cache)
+        first = client.get("WO_ETAG")
+        self.assertEqual(1031, len(first))
+        self.assertEqual(first, client.get("WO_ETAG"))
+        self.assertEqual(200, client.code)
+        self.assertEqual(2, transport.requests)
+        self.assertEqual((1, 1031), (cache.revalidations, cache.saved_bytes))
+        cache.default_ttl = 60
+        client.get("WO_ETAG")
+        client.get("WO_ETAG")
+        self.assertEqual(3, transport.requests)
+        self.assertTrue(cache.lookup(client.key + ' application/json ' + client.url + "/api/media/WO_ETAG").fresh)
+
+    def test_not_cached(self):
+        transport = WsgiTransport(app)
+        client = Schedule(key="a", secret="b", origin="http://www.vpro.nl").transport(transport)\
+            .cache_responses(DiskCache(self.directory.name, ttls={"/api/schedule": 0}))
+        client.get(channel="NED1")
+        client.get(channel="NED1")
+        self.assertEqual(2, transport.requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+import http.server
+import threading
+import unittest
+
+from npoapi import Media
+from npoapi.failover import CircuitBreaker
+from npoapi.npoapi import NpoApi
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"mid": "WO_VPRO_783763"}'
+        self.send_response(self.server.code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count += 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(code):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.code = code
+    server.count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Tests(unittest.TestCase):
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.failure()
+        self.assertTrue(breaker.allow())
+        breaker.failure()
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+        self.assertFalse(breaker.allow())
+        threading.Event().wait(0.06)
+        self.assertEqual(CircuitBreaker.HALF_OPEN, breaker.state)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.failure()
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+        threading.Event().wait(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.success()
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+
+    def test_nodes(self):
+        client = NpoApi(env="prod").failover()
+        self.assertEqual("https://rs-a.poms.omroep.nl/v1", client.url)
+        self.assertEqual(["https://rs-a.poms.omroep.nl/v1", "https://rs-b.poms.omroep.nl/v1"],
+                         [e.url for e in client.endpoints.endpoints])
+        self.assertEqual("https://rs-b-test.poms.omroep.nl/v1", NpoApi(env="testb").url)
+
+    def test_failover(self):
+        down = start_server(503)
+        up = start_server(200)
+        try:
+            client = Media(key="a", secret="b", origin="http://www.vpro.nl").retries(False).failover(
+                ["http://127.0.0.1:%d/v1" % s.server_address[1] for s in (down, up)], failure_threshold=2)
+            for i in range(5):
+                self.assertEqual('{"mid": "WO_VPRO_783763"}', client.get("WO_VPRO_783763"))
+            self.assertEqual(2, down.count)
+            self.assertEqual(5, up.count)
+            self.assertEqual(2, client.metrics["failovers"])
+            self.assertEqual(CircuitBreaker.OPEN, client.endpoints.endpoints[0].breaker.state)
+        finally:
+            for s in (down, up):
+                s.shutdown()
+                s.server_close()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+import http.server
+import threading
+import time
+import unittest
+
+from npoapi import Media
+from npoapi.hedging import LatencyTracker
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        body = ('{"node": "%s"}' % self.server.name).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(name, delay):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.name = name
+    server.delay = delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.a = start_server("a", 0)
+        self.b = start_server("b", 0)
+        self.client = Media(key="a", secret="b", origin="http://www.vpro.nl").hedged(
+            ["http://127.0.0.1:%d/v1" % s.server_address[1] for s in (self.a, self.b)], initial_delay=0.05)
+
+    def tearDown(self):
+        for s in (self.a, self.b):
+            s.shutdown()
+            s.server_close()
+
+    def test_percentile(self):
+        tracker = LatencyTracker(window=100)
+        for i in range(1, 101):
+            tracker.record(i / 100)
+        self.assertEqual(0.95, tracker.percentile(0.95))
+
+    def test_fast(self):
+        for i in range(3):
+            self.assertEqual('{"node": "a"}', self.client.get("WO_VPRO_783763"))
+        self.assertEqual(0, self.client.hedging.hedge_rate())
+
+    def test_slow(self):
+        self.a.delay = 1
+        start = time.monotonic()
+        self.assertEqual('{"node": "b"}', self.client.get("WO_VPRO_783763"))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(1.0, self.client.hedging.hedge_rate())
+        self.assertEqual(1, self.client.hedging.hedge_wins)
+        self.assertEqual(1, self.client.metrics["hedges"])
+
+    def test_not_hedgeable(self):
+        self.a.delay = 0.2
+        self.assertEqual('{"node": "a"}', self.client.changes())
+        self.assertEqual(0, self.client.hedging.requests)
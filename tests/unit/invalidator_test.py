@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import json
+import tempfile
+import unittest
+import urllib.parse
+
+from npoapi import AsyncMedia, Media
+from npoapi.disk_cache import DiskCache
+from npoapi.invalidator import ChangeFeedInvalidator
+from npoapi.transport import WsgiTransport
+
+CHANGES = [
+    {"publishDate": 1600000002000, "mid": "WO_1", "deleted": False},
+    {"publishDate": 1600000003000, "mid": "WO_2", "deleted": True},
+    {"publishDate": 1600000003000, "tail": True}
+]
+
+
+def changes_app(changes):
+    def app(environ, start_response):
+        path = environ["PATH_INFO"]
+        start_response("200 OK", [("Content-Type", "application/json")])
+        if path == "/v1/api/media/changes":
+            query = urllib.parse.parse_qs(environ["QUERY_STRING"])
+            since, limit = int(query["publishedSince"][0]), int(query["max"][0])
+            return [json.dumps({"changes": [c for c in changes if c["publishDate"] >= since][:limit]}).encode("utf-8")]
+        return [json.dumps({"mid": path.split("/")[-1]}).encode("utf-8")]
+    return app
+
+
+app = changes_app(CHANGES)
+
+
+class Tests(unittest.TestCase):
+
+    def test_poll(self):
+        transport = WsgiTransport(app)
+        with tempfile.TemporaryDirectory() as directory:
+            client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(transport)\
+                .cached(ttl=86400).cache_responses(DiskCache(directory, default_ttl=86400))
+            for mid in ("WO_1", "WO_2", "WO_3"):
+                client.get(mid)
+            client.multiple("WO_1,WO_3")
+            self.assertEqual(4, transport.requests)
+            invalidator = ChangeFeedInvalidator(client, since="1600000001000", refresh=True)
+            self.assertEqual(2, invalidator.poll())
+            self.assertEqual("1600000003000", invalidator.since)
+            self.assertEqual((2, 5, 1), (invalidator.changes, invalidator.invalidated, invalidator.refreshed))
+            requests = transport.requests
+            client.get("WO_1")
+            client.get("WO_3")
+            self.assertEqual(requests, transport.requests)
+            client.get("WO_2")
+            self.assertEqual(requests + 1, transport.requests)
+            self.assertEqual(0, invalidator.poll())
+
+    def test_same_publish_date(self):
+        changes = [{"publishDate": 1600000002000, "mid": "WO_%d" % i} for i in range(250)]
+        changes.append({"publishDate": 1600000003000, "mid": "WO_250"})
+        transport = WsgiTransport(changes_app(changes))
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(transport).cached()
+        invalidator = ChangeFeedInvalidator(client, since="1600000001000", limit=100)
+        self.assertEqual([100, 100, 51, 0], [invalidator.poll() for i in range(4)])
+        self.assertEqual(251, invalidator.changes)
+        self.assertEqual("1600000003000", invalidator.since)
+
+    def test_async(self):
+        with self.assertRaises(TypeError):
+            AsyncMedia().follow_changes()
+
+    def test_thread(self):
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(WsgiTransport(app)).cached()
+        client.get("WO_1")
+        invalidator = client.follow_changes(since="1600000001000", interval=0.01)
+        invalidator.stop(timeout=5)
+        self.assertGreaterEqual(invalidator.polls, 1)
+        self.assertEqual(0, invalidator.errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
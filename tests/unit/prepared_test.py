@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import unittest
+
+from npoapi import AsyncMedia, Media
+from npoapi.async_transport import AsyncWsgiTransport
+from npoapi.transport import WsgiTransport
+
+
+def app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [json.dumps({
+        "path": environ["PATH_INFO"],
+        "query": environ["QUERY_STRING"],
+        "accept": environ.get("HTTP_ACCEPT")}).encode("utf-8")]
+
+
+class Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.client = Media(key="a", secret="b", origin="http://www.vpro.nl")
+
+    def test_signature(self):
+        prepared = self.client.prepare("/api/media/{mid}", properties="title,description", profile="vpro", max=None)
+        req = prepared.build(mid="WO_VPRO/1")
+        expected_url, path_for_authentication = self.client._get_url("/api/media/WO_VPRO%2F1", {"properties": "title,description", "profile": "vpro"})
+        self.assertEqual(expected_url, req.full_url)
+        date = req.get_header("X-npo-date")
+        self.assertEqual(self.client.authenticate(path_for_authentication, now=date)[0], req.get_header("Authorization"))
+        self.assertEqual("http://www.vpro.nl", req.get_header("Origin"))
+        self.assertEqual("application/json", req.get_header("Accept"))
+
+    def test_authenticate_uses_current_date(self):
+        self.assertNotEqual("Fri, 30 Oct 2015 08:43:31 -0000", self.client.authenticate("/media")[1])
+
+    def test_call(self):
+        self.client.transport(WsgiTransport(app))
+        get = self.client.prepare("/api/media/{mid}", accept="application/xml", properties="title")
+        result = json.loads(get(mid="WO_VPRO_783763"))
+        self.assertEqual("/v1/api/media/WO_VPRO_783763", result["path"])
+        self.assertEqual("properties=title", result["query"])
+        self.assertEqual("application/xml", result["accept"])
+
+    def test_async(self):
+        client = AsyncMedia(key="a", secret="b", origin="http://www.vpro.nl").async_transport(AsyncWsgiTransport(app))
+        get = client.prepare("/api/media/{mid}")
+
+        async def run():
+            return await asyncio.gather(*[get(mid="M%d" % i) for i in range(3)])
+        self.assertEqual(["/v1/api/media/M%d" % i for i in range(3)], [json.loads(r)["path"] for r in asyncio.run(run())])
+
+
+if __name__ == '__main__':
+    unittest.main()
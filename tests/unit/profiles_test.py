@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+import unittest
+
+from npoapi.profiles import compile_profile, matching
+
+VPRO = """<profile name="vpro" xmlns="urn:vpro:api:profile:2013" xmlns:m="urn:vpro:api:constraint:media:2013">
+  <mediaProfile>
+    <m:filter>
+      <m:and>
+        <m:broadcaster>VPRO</m:broadcaster>
+        <m:not><m:avType>AUDIO</m:avType></m:not>
+        <m:or>
+          <m:hasLocation platform="INTERNETVOD"/>
+          <m:genre>3.0.1.*</m:genre>
+        </m:or>
+      </m:and>
+    </m:filter>
+  </mediaProfile>
+</profile>"""
+
+NED1 = """<profile name="ned1" xmlns="urn:vpro:api:profile:2013" xmlns:m="urn:vpro:api:constraint:media:2013">
+  <mediaProfile>
+    <m:filter>
+      <m:and>
+        <m:channel>NED1</m:channel>
+        <m:scheduleEvent date="2020-01-01" operator="GTE"/>
+        <m:ageRating>_16</m:ageRating>
+      </m:and>
+    </m:filter>
+  </mediaProfile>
+</profile>"""
+
+EVERYTHING = """<profile name="all" xmlns="urn:vpro:api:profile:2013"/>"""
+
+
+class Tests(unittest.TestCase):
+
+    def test_vpro(self):
+        predicate = compile_profile(VPRO)
+        self.assertTrue(predicate({"avType": "VIDEO", "broadcasters": [{"id": "VPRO", "value": "VPRO"}],
+                                   "locations": [{"platform": "INTERNETVOD", "programUrl": "http://a/b.mp4"}]}))
+        self.assertTrue(predicate({"avType": "VIDEO", "broadcasters": [{"id": "VPRO"}], "genres": [{"id": "3.0.1.1.4"}]}))
+        self.assertFalse(predicate({"avType": "AUDIO", "broadcasters": [{"id": "VPRO"}], "genres": [{"id": "3.0.1.1"}]}))
+        self.assertFalse(predicate({"avType": "VIDEO", "broadcasters": [{"id": "EO"}], "genres": [{"id": "3.0.1.1"}]}))
+        self.assertFalse(predicate({"avType": "VIDEO", "broadcasters": [{"id": "VPRO"}],
+                                    "locations": [{"platform": "TVVOD"}]}))
+
+    def test_schedule(self):
+        predicate = compile_profile(NED1)
+        # 2020-01-01T00:30 in the Netherlands
+        media = {"ageRating": "16", "scheduleEvents": [{"channel": "NED1", "start": 1577835000000}]}
+        self.assertTrue(predicate(media))
+        media["scheduleEvents"][0]["start"] -= 3600 * 1000
+        self.assertFalse(predicate(media))
+
+    def test_matching(self):
+        predicates = {"vpro": compile_profile(VPRO), "ned1": compile_profile(NED1), "all": compile_profile(EVERYTHING)}
+        self.assertEqual(["vpro", "all"], matching({"broadcasters": ["VPRO"], "images": [{}], "genres": ["3.0.1.7"]},
+                                                   predicates))
+
+    def test_filter(self):
+        predicate = compile_profile("<m:filter xmlns:m='urn:vpro:api:constraint:media:2013'><m:avType>VIDEO</m:avType></m:filter>")
+        self.assertTrue(predicate({"avType": "VIDEO"}))
+        with self.assertRaises(ValueError):
+            compile_profile("<api:redirects xmlns:api='urn:vpro:api:2013'/>")
+
+
+if __name__ == '__main__':
+    unittest.main()
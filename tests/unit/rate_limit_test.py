@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+import tempfile
+import threading
+import time
+import unittest
+
+from npoapi import rate_limit
+from npoapi.npoapi import NpoApi
+from npoapi.rate_limit import TokenBucket, FileTokenBucket
+
+
+class Tests(unittest.TestCase):
+
+    def test_burst_and_rate(self):
+        bucket = TokenBucket(rate=100, capacity=5)
+        start = time.monotonic()
+        for i in range(5):
+            self.assertEqual(0, bucket.acquire())
+        self.assertLess(time.monotonic() - start, 0.05)
+        for i in range(10):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_threads(self):
+        bucket = TokenBucket(rate=200, capacity=1)
+        start = time.monotonic()
+        threads = [threading.Thread(target=lambda: [bucket.acquire() for i in range(10)]) for t in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertGreaterEqual(time.monotonic() - start, 39 / 200)
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            a = rate_limit.for_key("key", rate=100, capacity=1, directory=directory)
+            b = FileTokenBucket(rate=100, capacity=1, path=a.path)
+            self.assertIsInstance(a, FileTokenBucket)
+            start = time.monotonic()
+            for i in range(10):
+                (a if i % 2 else b).acquire()
+            self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_shared_per_key(self):
+        a = NpoApi(key="a", secret="s", origin="o").rate_limit(10)
+        b = NpoApi(key="a", secret="t", origin="o").rate_limit(10)
+        c = NpoApi(key="c", secret="s", origin="o").rate_limit(10)
+        self.assertIs(a.rate_limiter, b.rate_limiter)
+        self.assertIsNot(a.rate_limiter, c.rate_limiter)
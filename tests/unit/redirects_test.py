@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import json
+import time
+import unittest
+import urllib.parse
+
+from npoapi import AsyncMedia, Media
+from npoapi.redirects import RedirectResolver
+from npoapi.transport import WsgiTransport
+
+REDIRECTS = b"""<?xml version="1.0" encoding="UTF-8"?>
+<api:redirects xmlns:api="urn:vpro:api:2013" lastUpdate="2020-01-01T12:00:00Z" lastChange="2020-01-01T11:00:00Z">
+  <api:entry from="WO_VPRO_1" to="WO_VPRO_2"/>
+  <api:entry from="WO_VPRO_2" to="WO_VPRO_3"/>
+  <api:entry from="WO_VPRO_4" to="WO_VPRO_5"/>
+  <api:entry from="WO_VPRO_5" to="WO_VPRO_4"/>
+</api:redirects>"""
+
+
+def app(environ, start_response):
+    path = environ["PATH_INFO"]
+    if path == "/v1/api/media/redirects":
+        start_response("200 OK", [("Content-Type", "application/xml")])
+        return [REDIRECTS]
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [json.dumps({"path": path, "ids": urllib.parse.parse_qs(environ["QUERY_STRING"]).get("ids")}).encode("utf-8")]
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Tests(unittest.TestCase):
+
+    def test_collapse(self):
+        self.assertEqual({"a": "c", "b": "c"},
+                         RedirectResolver.collapse({"a": "b", "b": "c", "d": "d", "e": "d", "f": "g", "g": "f"}))
+
+    def test_get(self):
+        transport = WsgiTransport(app)
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(transport).resolve_redirects()
+        self.assertEqual("/v1/api/media/WO_VPRO_3", json.loads(client.get("WO_VPRO_1"))["path"])
+        self.assertEqual("/v1/api/media/WO_VPRO_3", json.loads(client.get("WO_VPRO_2"))["path"])
+        self.assertEqual("/v1/api/media/WO_VPRO_4", json.loads(client.get("WO_VPRO_4"))["path"])
+        self.assertEqual(["WO_VPRO_3,WO_VPRO_6"], json.loads(client.multiple("WO_VPRO_1, WO_VPRO_6"))["ids"])
+        self.assertEqual(4, transport.requests - 1)
+        self.assertEqual(3, client.redirect_resolver.rewrites)
+        self.assertEqual(2, len(client.redirect_resolver))
+
+    def test_refresh(self):
+        transport = WsgiTransport(app)
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(transport)\
+            .resolve_redirects(refresh_interval=60)
+        resolver = client.redirect_resolver
+        resolver._now = Clock()
+        self.assertEqual("WO_VPRO_3", resolver.resolve("WO_VPRO_1"))
+        resolver._now.now += 30
+        resolver.resolve("WO_VPRO_1")
+        self.assertEqual(1, resolver.refreshes)
+        resolver._now.now += 30
+        self.assertEqual("WO_VPRO_3", resolver.resolve("WO_VPRO_1"))
+        for i in range(500):
+            if resolver.refreshes == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(2, resolver.refreshes)
+        self.assertEqual(2, transport.requests)
+
+    def test_async(self):
+        with self.assertRaises(TypeError):
+            AsyncMedia().resolve_redirects()
+        self.assertIsNone(AsyncMedia().resolve_redirects(None).redirect_resolver)
+
+
+if __name__ == '__main__':
+    unittest.main()
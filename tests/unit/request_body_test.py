@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+import asyncio
+import http.server
+import io
+import json
+import mmap
+import os
+import tempfile
+import threading
+import unittest
+import urllib.request
+
+from npoapi import Media, MediaBackend
+from npoapi import request_body
+from npoapi.async_transport import AsyncConnectionPool
+from npoapi.connection_pool import ConnectionPool
+from npoapi.retry import RetryPolicy
+from npoapi.transport import WsgiTransport
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            received = b""
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                chunk = self.rfile.read(size + 2)[:size]
+                if size == 0:
+                    break
+                received += chunk
+        else:
+            received = self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"transfer-encoding": self.headers.get("Transfer-Encoding"), "length": len(received),
+                           "body": received[:20].decode("utf-8"),
+                           "content-type": self.headers.get("Content-Type")}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def generate(count):
+    for i in range(count):
+        yield b"x" * 1000
+
+
+class Tests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:%d" % cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_chunked(self):
+        pool = ConnectionPool()
+        for body in (generate(100), io.BytesIO(b"y" * 100000)):
+            with pool.urlopen(urllib.request.Request(self.url + "/", data=body)) as response:
+                result = json.loads(response.read().decode("utf-8"))
+            self.assertEqual("chunked", result["transfer-encoding"])
+            self.assertEqual(100000, result["length"])
+
+    def test_memoryview(self):
+        with ConnectionPool().urlopen(urllib.request.Request(self.url + "/", data=memoryview(b"abc"))) as response:
+            result = json.loads(response.read().decode("utf-8"))
+        self.assertIsNone(result["transfer-encoding"])
+        self.assertEqual("abc", result["body"])
+
+    def test_chunked_async(self):
+        async def run():
+            pool = AsyncConnectionPool()
+            response = await pool.urlopen(urllib.request.Request(self.url + "/", data=generate(100)))
+            result = json.loads((await response.read()).decode("utf-8"))
+            await pool.close()
+            return result
+        result = asyncio.run(run())
+        self.assertEqual("chunked", result["transfer-encoding"])
+        self.assertEqual(100000, result["length"])
+
+    def test_retry(self):
+        bodies = []
+
+        def app(environ, start_response):
+            bodies.append(environ["wsgi.input"].read())
+            start_response("503 Service Unavailable", [("Content-Type", "text/plain")])
+            return [b"busy"]
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(WsgiTransport(app))\
+            .retries(RetryPolicy(max_retries=2, backoff_factor=0, retry_posts=True))
+        client.stream("/api/media", data=io.BytesIO(b'{"a": 1}'))
+        self.assertEqual([b'{"a": 1}'] * 3, bodies)
+        del bodies[:]
+        client.stream("/api/media", data=generate(2))
+        self.assertEqual([b"x" * 2000], bodies)
+        self.assertEqual(503, client.code)
+
+    def test_stream_content_type(self):
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl", env=self.url + "/v1")
+        form = io.BytesIO(b' {"searches": {}}')
+        result = json.loads(client.search(form=form))
+        self.assertEqual(("chunked", "application/json", ' {"searches": {}}'),
+                         (result["transfer-encoding"], result["content-type"], result["body"]))
+        result = json.loads(client.search(form=io.BytesIO(b"<form/>")))
+        self.assertEqual("application/xml", result["content-type"])
+        result = json.loads(client.iterate(form=generate(1), stream=False))
+        self.assertEqual("application/json", result["content-type"])
+        result = json.loads(client.search(form=generate(1), content_type="application/xml"))
+        self.assertEqual("application/xml", result["content-type"])
+
+    def test_no_json_round_trip(self):
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl")
+        data, content_type = client._get_data('{ "a" : 1 }')
+        self.assertEqual((b'{ "a" : 1 }', "application/json"), (data, content_type))
+        data, content_type = client.normalize_json()._get_data('{ "a" : 1 }')
+        self.assertEqual((b'{"a": 1}', "application/json"), (data, content_type))
+
+    def test_file_name(self):
+        with tempfile.NamedTemporaryFile(suffix=".xml", delete=False) as f:
+            f.write(b"<program/>")
+        try:
+            self.assertEqual((b"<program/>", "application/xml"), Media().data_to_bytes(f.name))
+        finally:
+            os.remove(f.name)
+
+    def test_map_file(self):
+        with tempfile.NamedTemporaryFile(suffix=".xml", delete=False) as f:
+            f.write(b"<program>" + b"x" * 1000000 + b"</program>")
+        try:
+            data, content_type = Media().data_to_bytes(f.name)
+            self.assertIsInstance(data.obj, mmap.mmap)
+            self.assertEqual("application/xml", content_type)
+            with ConnectionPool().urlopen(urllib.request.Request(self.url + "/", data=data)) as response:
+                result = json.loads(response.read().decode("utf-8"))
+            self.assertIsNone(result["transfer-encoding"])
+            self.assertEqual(1000019, result["length"])
+        finally:
+            del data
+            os.remove(f.name)
+
+    def test_post_location_from_file(self):
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [environ["wsgi.input"].read()]
+        client = MediaBackend().transport(WsgiTransport(app))
+        client.url = "http://localhost/"
+        client.settings["user"] = "user:password"
+        with tempfile.NamedTemporaryFile(suffix=".xml", delete=False) as f:
+            f.write(b"<location><programUrl>http://www.vpro.nl/a.mp4</programUrl></location>")
+        try:
+            self.assertEqual("<location><programUrl>http://www.vpro.nl/a.mp4</programUrl></location>",
+                             client.post_location("POMS_VPRO_123", f.name))
+        finally:
+            os.remove(f.name)
+
+    def test_rewind(self):
+        req = urllib.request.Request("http://localhost/", data=generate(1))
+        self.assertTrue(request_body.rewind(req))
+        self.assertTrue(request_body.replayable(req))
+        list(req.data)
+        self.assertFalse(request_body.replayable(req))
+        self.assertFalse(request_body.rewind(req))
+
+
+if __name__ == '__main__':
+    unittest.main()
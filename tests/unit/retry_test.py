@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+import email.utils
+import http.server
+import threading
+import time
+import unittest
+import urllib.error
+
+from npoapi import Media
+from npoapi.retry import RetryPolicy
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    failures = 0
+    count = 0
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.respond()
+
+    def respond(self):
+        Handler.count += 1
+        if Handler.count <= Handler.failures:
+            code, body = 503, b"Service Unavailable"
+        else:
+            code, body = 200, b'{"mid": "WO_VPRO_783763"}'
+        self.send_response(code)
+        self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def http_error(code, headers=None):
+    return urllib.error.HTTPError("http://localhost", code, "error", headers or {}, None)
+
+
+class Tests(unittest.TestCase):
+
+    def test_idempotent(self):
+        policy = RetryPolicy(max_retries=2)
+        self.assertIsNotNone(policy.delay("GET", urllib.error.URLError(ConnectionResetError()), 0))
+        self.assertIsNotNone(policy.delay("DELETE", http_error(502), 1))
+        self.assertIsNone(policy.delay("GET", http_error(502), 2))
+        self.assertIsNone(policy.delay("GET", http_error(404), 0))
+        self.assertIsNone(policy.delay("POST", http_error(503), 0))
+        self.assertIsNotNone(RetryPolicy(retry_posts=True).delay("POST", http_error(503), 0))
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5)
+        for attempt in range(10):
+            self.assertLessEqual(policy.backoff(attempt), min(5, 2 ** attempt))
+
+    def test_retry_after(self):
+        policy = RetryPolicy()
+        self.assertEqual(7, policy.delay("GET", http_error(429, {"Retry-After": "7"}), 0))
+        self.assertIsNone(policy.delay("GET", http_error(503, {"Retry-After": "3600"}), 0))
+        date = email.utils.formatdate(time.time() + 60, usegmt=True)
+        self.assertAlmostEqual(60, RetryPolicy.retry_after({"Retry-After": date}), delta=2)
+        self.assertIsNone(RetryPolicy.retry_after({"Retry-After": "tomorrow"}))
+
+
+class ClientTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:%d/v1" % cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.count = 0
+        self.client = Media(key="a", secret="b", origin="http://www.vpro.nl", env=self.url)
+
+    def test_retried(self):
+        Handler.failures = 2
+        self.assertEqual('{"mid": "WO_VPRO_783763"}', self.client.get("WO_VPRO_783763"))
+        self.assertEqual(2, self.client.metrics["retries"])
+        self.assertEqual(200, self.client.code)
+
+    def test_gives_up(self):
+        Handler.failures = 10
+        self.assertEqual("", self.client.retries(RetryPolicy(max_retries=1)).get("WO_VPRO_783763"))
+        self.assertEqual(1, self.client.metrics["retries"])
+        self.assertEqual(503, self.client.code)
+
+    def test_post_not_retried(self):
+        Handler.failures = 1
+        self.assertEqual("", self.client.search(form="{}"))
+        self.assertEqual(0, self.client.metrics["retries"])
+        Handler.count = 0
+        self.client.retries(RetryPolicy(retry_posts=True)).search(form="{}")
+        self.assertEqual(1, self.client.metrics["retries"])
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import asyncio
+import datetime
+import json
+import tempfile
+import unittest
+import urllib.parse
+
+from npoapi import AsyncSchedule, Schedule
+from npoapi.async_transport import AsyncWsgiTransport
+from npoapi.disk_cache import DiskCache
+from npoapi.transport import WsgiTransport
+
+
+def app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "application/json")])
+    query = urllib.parse.parse_qs(environ["QUERY_STRING"])
+    return [json.dumps({"path": environ["PATH_INFO"], "guideDay": query.get("guideDay")}).encode("utf-8")]
+
+
+class Tests(unittest.TestCase):
+
+    def test_immutable(self):
+        client = Schedule().cached(immutable_after=2)
+        today = datetime.date.today()
+        self.assertTrue(client._immutable(today - datetime.timedelta(days=2)))
+        self.assertTrue(client._immutable("2020-01-01"))
+        self.assertFalse(client._immutable((today - datetime.timedelta(days=1)).isoformat()))
+        self.assertFalse(client._immutable(None))
+        self.assertFalse(client._immutable("yesterday"))
+
+    def test_ttl(self):
+        transport = WsgiTransport(app)
+        client = Schedule(key="a", secret="b", origin="http://www.vpro.nl").transport(transport).cached(ttl=-1)
+        client.get(guideDay="2020-01-01", channel="NED1")
+        client.get(guideDay="2020-01-01", channel="NED1")
+        self.assertEqual(1, transport.requests)
+        client.get(guideDay=datetime.date.today().isoformat(), channel="NED1")
+        client.get(guideDay=datetime.date.today().isoformat(), channel="NED1")
+        self.assertEqual(3, transport.requests)
+
+    def test_prewarm_persisted(self):
+        transport = WsgiTransport(app)
+        with tempfile.TemporaryDirectory() as directory:
+            client = Schedule(key="a", secret="b", origin="http://www.vpro.nl").transport(transport)\
+                .cached().cache_responses(DiskCache(directory))
+            self.assertEqual(62, client.prewarm("2020-01-01", datetime.date(2020, 2, 1), channels=("NED1", "NED2")))
+            self.assertEqual(62, transport.requests)
+            client = Schedule(key="a", secret="b", origin="http://www.vpro.nl").transport(transport)\
+                .cached().cache_responses(directory)
+            result = json.loads(client.get(guideDay="2020-01-15", channel="NED2"))
+            self.assertEqual(["2020-01-15"], result["guideDay"])
+            self.assertEqual("/v1/api/schedule/channel/NED2", result["path"])
+            self.assertEqual(62, transport.requests)
+
+    def test_async(self):
+        transport = AsyncWsgiTransport(app)
+        client = AsyncSchedule(key="a", secret="b", origin="http://www.vpro.nl").async_transport(transport).cached()
+
+        async def run():
+            count = await client.prewarm("2020-01-01", "2020-01-11", channels=("NED1",), max_workers=3)
+            return count, await client.get(guideDay="2020-01-05", channel="NED1"), \
+                await client.get(guideDay="2020-01-05", channel="NED1")
+        count, first, second = asyncio.run(run())
+        self.assertEqual(10, count)
+        self.assertEqual(["2020-01-05"], json.loads(first)["guideDay"])
+        self.assertEqual(first, second)
+        self.assertEqual(10, transport.requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
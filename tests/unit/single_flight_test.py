@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import json
+import threading
+import time
+import unittest
+
+from npoapi import Media, MediaBackend
+from npoapi.single_flight import SingleFlight
+from npoapi.transport import WsgiTransport
+
+
+def app(environ, start_response):
+    time.sleep(0.2)
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [json.dumps({"path": environ["PATH_INFO"], "query": environ["QUERY_STRING"],
+                        "authorization": environ.get("HTTP_AUTHORIZATION", "").split(":")[0]}).encode("utf-8")]
+
+
+def concurrently(count, function):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(i):
+        barrier.wait()
+        results[i] = function(i)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class Tests(unittest.TestCase):
+
+    def test_do(self):
+        single_flight = SingleFlight()
+
+        def slow():
+            time.sleep(0.2)
+            return object()
+        results = concurrently(10, lambda i: single_flight.do("key", slow))
+        self.assertEqual(1, len(set(id(r) for r, shared in results)))
+        self.assertEqual(9, len([shared for r, shared in results if shared]))
+        self.assertEqual(1, single_flight.executed)
+        self.assertEqual(0, len(single_flight))
+
+    def test_error(self):
+        single_flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.2)
+            raise ValueError("fail")
+
+        def call(i):
+            try:
+                single_flight.do("key", fail)
+            except ValueError as e:
+                return e
+        self.assertEqual(["fail"] * 5, [str(e) for e in concurrently(5, call)])
+
+    def test_media_get(self):
+        transport = WsgiTransport(app)
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(transport).coalesce()
+        results = concurrently(10, lambda i: client.get("WO_VPRO_783763", properties="title"))
+        self.assertEqual(1, transport.requests)
+        self.assertEqual(1, len(set(results)))
+        self.assertEqual(9, client.metrics["coalesced"])
+        results = concurrently(4, lambda i: client.get("WO_VPRO_%d" % i))
+        self.assertEqual(5, transport.requests)
+        self.assertEqual(4, len(set(results)))
+
+    def test_configured_keys(self):
+        transport = WsgiTransport(app)
+        single_flight = SingleFlight()
+        clients = []
+        for key in ("keyA", "keyB"):
+            client = Media().transport(transport).coalesce(single_flight)
+            client.settings.update({"apiKey": key, "secret": "secret", "origin": "http://www.vpro.nl"})
+            clients.append(client)
+        results = concurrently(2, lambda i: json.loads(clients[i].get("WO_VPRO_1"))["authorization"])
+        self.assertEqual(["NPO keyA", "NPO keyB"], results)
+        self.assertEqual(2, transport.requests)
+
+    def test_backend_get(self):
+        transport = WsgiTransport(app)
+        client = MediaBackend().transport(transport).coalesce()
+        client.url = "http://localhost/"
+        client.settings["user"] = "user:password"
+        results = concurrently(5, lambda i: (client.get("POMS_VPRO_123"), client.code))
+        self.assertEqual(1, transport.requests)
+        self.assertEqual([200] * 5, [code for result, code in results])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+import concurrent.futures
+import unittest
+
+from npoapi import Media, MediaBackend
+from npoapi.transport import WsgiTransport
+
+
+def app(environ, start_response):
+    path = environ["PATH_INFO"]
+    if "MISSING" in path:
+        start_response("404 Not Found", [("Content-Type", "text/plain")])
+        return [b"not found"]
+    start_response("200 OK", [("Content-Type", "text/plain"), ("X-Path", path)])
+    return [environ.get("HTTP_AUTHORIZATION", "").encode("utf-8")]
+
+
+class Tests(unittest.TestCase):
+
+    def test_code_per_thread(self):
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(WsgiTransport(app)).retries(False)
+
+        def get(i):
+            mid = "MISSING_%d" % i if i % 2 else "WO_VPRO_%d" % i
+            client.get(mid)
+            return mid, client.code, client.result()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(get, range(200)))
+        for mid, code, result in results:
+            self.assertEqual(404 if mid.startswith("MISSING") else 200, code)
+            self.assertEqual(code, result.status)
+            if result.ok:
+                self.assertEqual("/v1/api/media/" + mid, result.headers["X-Path"])
+        self.assertEqual(200, client.metrics["requests"])
+        self.assertEqual(100, client.metrics["failures"])
+
+    def test_backends_with_different_credentials(self):
+        transport = WsgiTransport(app)
+        clients = []
+        for user in ("a:x", "b:y"):
+            client = MediaBackend().transport(transport)
+            client.url = "http://localhost/"
+            client.settings["user"] = user
+            clients.append(client)
+
+        def get(i):
+            return i % 2, clients[i % 2].get("POMS_VPRO_%d" % i)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(get, range(100)))
+        for i, authorization in results:
+            self.assertEqual(["Basic YTp4", "Basic Yjp5"][i], authorization)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+import json
+import unittest
+import urllib.request
+
+from npoapi import Media, MediaBackend, Pages, TranscodingUtil
+from npoapi.transport import WsgiTransport
+
+
+def app(environ, start_response):
+    path = environ["PATH_INFO"]
+    if path == "/v1/api/media/WO_VPRO_783763":
+        body = json.dumps({
+            "mid": "WO_VPRO_783763",
+            "query": environ["QUERY_STRING"],
+            "authorization": environ.get("HTTP_AUTHORIZATION"),
+            "origin": environ.get("HTTP_ORIGIN")}).encode("utf-8")
+        start_response("200 OK", [("Content-Type", "application/json")])
+        return [body]
+    if path == "/v1/api/pages/iterate":
+        form = json.loads(environ["wsgi.input"].read(int(environ["CONTENT_LENGTH"])).decode("utf-8"))
+        start_response("200 OK", [("Content-Type", "application/json")])
+        return generate_pages(form["max"])
+    if path == "/media/media/POMS_VPRO_123":
+        start_response("200 OK", [("Content-Type", "application/xml")])
+        return [("<program mid='POMS_VPRO_123' user='%s'/>" % environ.get("HTTP_AUTHORIZATION")).encode("utf-8")]
+    if environ["REQUEST_METHOD"] == "HEAD" and path == "/exists.mp4":
+        start_response("200 OK", [])
+        return []
+    start_response("404 Not Found", [("Content-Type", "text/plain")])
+    return [b"not found"]
+
+
+def generate_pages(count):
+    """A generator, so start_response is only called on the first iteration"""
+    yield b'{"pages": ['
+    for i in range(count):
+        yield (("," if i else "") + json.dumps({"url": "http://www.vpro.nl/%d" % i})).encode("utf-8")
+    yield b']}'
+
+
+class Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = WsgiTransport(app)
+
+    def test_media_get(self):
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(self.transport)
+        result = json.loads(client.get("WO_VPRO_783763", properties="title"))
+        self.assertEqual("WO_VPRO_783763", result["mid"])
+        self.assertEqual("properties=title", result["query"])
+        self.assertTrue(result["authorization"].startswith("NPO a:"))
+        self.assertEqual("http://www.vpro.nl", result["origin"])
+        self.assertEqual(1, self.transport.requests)
+
+    def test_not_found(self):
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(self.transport)
+        self.assertEqual("", client.get("WO_VPRO_404"))
+        self.assertEqual(404, client.code)
+
+    def test_streaming(self):
+        client = Pages(key="a", secret="b", origin="http://www.vpro.nl").transport(self.transport)
+        urls = [page["url"] for page in client.iterate(form='{"max": 1000}')]
+        self.assertEqual(1000, len(urls))
+
+    def test_backend(self):
+        client = MediaBackend().transport(self.transport)
+        client.url = "http://localhost/"
+        client.settings["user"] = "user:password"
+        self.assertEqual("<program mid='POMS_VPRO_123' user='Basic dXNlcjpwYXNzd29yZA=='/>", client.get("POMS_VPRO_123"))
+
+    def test_check_exists(self):
+        self.assertTrue(TranscodingUtil.check_exists("http://download.omroep.nl/exists.mp4", transport=self.transport))
+        self.assertFalse(TranscodingUtil.check_exists("http://download.omroep.nl/missing.mp4", transport=self.transport))
+
+    def test_environ(self):
+        req = urllib.request.Request("https://rs.poms.omroep.nl/v1/api/media/a%2Fb?x=1", data=b"{}",
+                                     headers={"Content-Type": "application/json", "X-NPO-Date": "now"})
+        environ = self.transport.environ(req)
+        self.assertEqual("POST", environ["REQUEST_METHOD"])
+        self.assertEqual("/v1/api/media/a/b", environ["PATH_INFO"])
+        self.assertEqual("x=1", environ["QUERY_STRING"])
+        self.assertEqual("443", environ["SERVER_PORT"])
+        self.assertEqual("application/json", environ["CONTENT_TYPE"])
+        self.assertEqual("2", environ["CONTENT_LENGTH"])
+        self.assertEqual("now", environ["HTTP_X_NPO_DATE"])
+
+    def test_write(self):
+        def writing_app(environ, start_response):
+            write = start_response("200 OK", [("Content-Type", "application/json")])
+            write(b'{"mid": ')
+            write(b'"WO_1", ')
+            return [b'"title": "written"}']
+        client = Media(key="a", secret="b", origin="http://www.vpro.nl").transport(WsgiTransport(writing_app))
+        self.assertEqual({"mid": "WO_1", "title": "written"}, json.loads(client.get("WO_1")))